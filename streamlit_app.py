@@ -13,25 +13,41 @@ Created: 2025
 # Streamlit - Web app framework that turns Python scripts into interactive web apps
 # OS - Provides functions for interacting with the operating system (like reading environment variables)
 # Pathlib - Object-oriented way to handle file paths
-# TOML - Library for parsing TOML configuration files (used for secrets management)
-# PDFPlumber - Library for extracting text and data from PDFs
-# BytesIO - Allows working with bytes data as if it were a file
 # Custom utility functions for calling AI models (OpenAI, etc.)
+# Custom utility functions for extracting text from PDFs
 # Custom utility functions for formatting prompts to send to AI models
+#
+# Heavy, rarely needed libraries (toml, the PDF parsers) are imported lazily
+# inside the functions that use them: Streamlit re-executes this whole module
+# on every widget interaction, so keeping the top-level imports minimal keeps
+# the no-op rerun path cheap.
 
 import streamlit as st
 import os
+import asyncio
+import hashlib
 import pathlib
-import toml
-import pdfplumber
-from io import BytesIO
-from utils.llm import call_llm_api
-from utils.prompt import format_prompt
+from utils.llm import (
+    call_llm_api_stream,
+    call_llm_api_async,
+    call_llm_api_many,
+    submit_batch_analysis,
+    check_batch_analysis,
+)
+from utils.pdf import extract_text_with_timeout
+from utils.prompt import format_prompt_cached, format_prompt_parts, count_tokens, chunk_content
+
+# Contracts longer than this many tokens get the chunked (map-reduce)
+# analysis: a single 2000-token completion can't cover a very long document,
+# and per-chunk calls can run in parallel
+CHUNK_TOKENS = 4000
 
 # --- Custom Styling ---
 
 # This CSS customizes the Streamlit interface appearance
-# Hide the hamburger menu, Deploy button, and sidebar close button
+# Hide the hamburger menu, Deploy button, and sidebar close button.
+# (The primary button color now comes from the [theme] section of
+# .streamlit/config.toml, so no CSS is needed for it.)
 hide_streamlit_style = """
 <style>
 #MainMenu {visibility: hidden;}  /* Hides the hamburger menu in the top-right */
@@ -41,34 +57,24 @@ header {visibility: hidden;}     /* Hides the header section */
 [data-testid="stSidebarCollapseButton"] {
     display: none;
 }
-/* Change primary button color to blue for better visibility */
-.stButton>button:first-child {
-    background-color: #1E88E5;  /* Sets button background to blue */
-    border-color: #1E88E5;      /* Sets button border to match background */
-}
-.stButton>button:first-child:hover {
-    background-color: #1565C0;  /* Darker blue on hover for visual feedback */
-    border-color: #1565C0;
-}
 </style>
 """
 
 # --- Helper Functions ---
 
-def load_api_key():
+@st.cache_resource
+def _load_api_key_cached():
     """
-    Load OpenAI API key from environment variables or secrets.toml.
-    
-    This function tries two methods to find your OpenAI API key:
-    1. First checks if it's set as an environment variable called 'OPENAI_API_KEY'
-    2. If not found there, looks for it in the .streamlit/secrets.toml file
-    
+    Look up the OpenAI API key (cached); see load_api_key for the policy.
+
+    The result is cached with st.cache_resource (the singleton-style cache,
+    so the secret is never re-hashed) - without it every rerun would repeat
+    the environment lookup and TOML parse for no benefit. As a side effect
+    the key is exported to os.environ exactly once, on the first call, so
+    the OpenAI library can pick it up.
+
     Returns:
         str: The OpenAI API key if found, None otherwise
-    
-    Note for beginners:
-        API keys are like passwords that let your application use OpenAI's services.
-        They should be kept secret and never shared or committed to public repositories.
     """
     # First try to get from environment variables
     # os.getenv looks for a named variable in your system's environment
@@ -81,49 +87,212 @@ def load_api_key():
         # pathlib.Path makes working with file paths easier
         secrets_path = pathlib.Path(__file__).parent / '.streamlit' / 'secrets.toml'
         if secrets_path.exists():
+            # Imported here so reruns that never touch the secrets file
+            # don't pay for the library at all
+            import toml
+
             # Load and parse the TOML file
             secrets = toml.load(secrets_path)
             # Try to get the API key from the 'default' section
             # The get() method returns None if the key doesn't exist
             api_key = secrets.get("default", {}).get("OPENAI_API_KEY")
     
-    # Show an error if the API key wasn't found anywhere
     if not api_key:
+        return None
+
+    # Export for the OpenAI library - done here so it happens exactly once
+    # per worker instead of on every rerun
+    os.environ["OPENAI_API_KEY"] = api_key
+    return api_key
+
+def load_api_key():
+    """
+    Load OpenAI API key from environment variables or secrets.toml.
+
+    This function tries two methods to find your OpenAI API key:
+    1. First checks if it's set as an environment variable called 'OPENAI_API_KEY'
+    2. If not found there, looks for it in the .streamlit/secrets.toml file
+
+    Successful lookups are cached for the lifetime of the process, but a
+    failed lookup is not: the user may add the key to secrets.toml while
+    the app is running, and the next rerun should pick it up instead of
+    replaying the cached failure (the same policy as utils.llm.get_api_key).
+
+    Returns:
+        str: The OpenAI API key if found, None otherwise
+
+    Note for beginners:
+        API keys are like passwords that let your application use OpenAI's services.
+        They should be kept secret and never shared or committed to public repositories.
+    """
+    api_key = _load_api_key_cached()
+    if not api_key:
+        # Don't pin the failure - forget it so the next rerun retries
+        _load_api_key_cached.clear()
         st.error("Error: OPENAI_API_KEY not found in environment variables or secrets.toml")
-    
+        return None
     return api_key
 
-def extract_text_from_pdf(uploaded_file):
+@st.cache_data(show_spinner=False, ttl=24 * 60 * 60, max_entries=16)
+def _extract_text_cached(pdf_bytes: bytes) -> str:
     """
-    Extract text from uploaded PDF file.
-    
-    This function takes a PDF file that was uploaded through Streamlit's
-    file_uploader and extracts all the text content from it.
-    
+    Extract text from raw PDF bytes, caching the result across reruns.
+
+    Streamlit re-executes the whole script on every widget interaction, so
+    without caching the same PDF would be re-parsed (pypdfium2, with the
+    pdfminer fallback) on each rerun. st.cache_data hashes the bytes
+    argument and returns the stored result on a hit, skipping the parsers
+    entirely for a file it has already seen. The TTL and max_entries bound
+    how much memory the cache can hold.
+
     Args:
-        uploaded_file: A file object from st.file_uploader
-        
+        pdf_bytes: The raw bytes of the uploaded PDF file
+
+    Returns:
+        str: The extracted text from all pages, with pages separated by double newlines.
+    """
+    # The actual parsing lives in utils.pdf, which extracts pages in
+    # parallel for longer documents and enforces a wall-clock timeout so
+    # a pathological file can't hang the worker
+    return extract_text_with_timeout(pdf_bytes)
+
+def extract_text_from_pdf(file_bytes: bytes):
+    """
+    Extract text from an uploaded PDF file's bytes.
+
+    The caller reads the upload once with uploaded_file.getvalue() and
+    passes the bytes along - materializing the file again here would keep
+    a second full copy resident for no reason. The actual parsing is
+    delegated to _extract_text_cached, so repeated analyses of the same
+    file (or reruns of the script) reuse the cached text instead of
+    parsing the PDF again.
+
+    Args:
+        file_bytes: The raw bytes of the uploaded PDF
+
     Returns:
         str: The extracted text from all pages, with pages separated by double newlines.
              Returns an empty string if extraction fails.
-    
+
     Note for beginners:
         PDFs can store text in different ways. This function extracts readable text,
         but might not work well with scanned documents or images of text.
     """
+    # Fail fast if the file isn't a PDF at all - every valid PDF starts
+    # with the "%PDF-" magic bytes, and handing arbitrary data to the
+    # parsers risks slow pathological failure modes instead of a clear error
+    if not file_bytes.startswith(b"%PDF-"):
+        st.error("The uploaded file is not a valid PDF.")
+        return ""
+
     try:
-        # Convert the uploaded file to bytes that pdfplumber can read
-        # BytesIO creates an in-memory file-like object
-        with pdfplumber.open(BytesIO(uploaded_file.getvalue())) as pdf:
-            # Extract text from each page and join them with double newlines
-            # This is a list comprehension - a compact way to process each page
-            # filter(None, ...) removes any pages that returned None (no text)
-            return "\n\n".join(filter(None, (p.extract_text() for p in pdf.pages)))
+        # Raw bytes also let the cache hash them and dedupe repeated files
+        return _extract_text_cached(file_bytes)
     except Exception as e:
         # If anything goes wrong, show an error and return empty string
         st.error(f"Error extracting text from PDF: {e}")
         return ""
 
+def _response_key(file_bytes: bytes, instructions: str) -> str:
+    """
+    Compute the session-cache key for one (file, instructions) combination.
+
+    Hashing the raw upload plus the instructions identifies an analysis
+    request without storing megabytes of prompt text as dictionary keys,
+    and lets the app skip not just the LLM call but also PDF extraction
+    and prompt formatting when the user returns to a file they already
+    analyzed this session. BLAKE2b hashes a 2MB file in a couple of
+    milliseconds - negligible next to the work a hit saves.
+
+    Args:
+        file_bytes: The raw bytes of the uploaded PDF
+        instructions: The user's analysis guidelines
+
+    Returns:
+        str: A short hex digest identifying the request
+    """
+    return hashlib.blake2b(
+        file_bytes + instructions.encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+def _is_error_response(text: str) -> bool:
+    """
+    Detect responses carrying the error-string convention from utils.llm.
+
+    Provider failures come back as text rather than exceptions - either a
+    whole "Error: ..." response, or (for the chunked path) per-section
+    error strings embedded in the merged report. Those must never enter
+    the session cache, or re-running the same file would replay the stale
+    error instead of retrying; this mirrors the disk cache's policy.
+
+    Args:
+        text: The response text to inspect
+
+    Returns:
+        bool: True when the response is or contains an error string
+    """
+    return (
+        not text
+        or text.startswith("Error")
+        or "\nError:" in text
+        or "Error calling LLM API" in text
+    )
+
+async def _analyze_large_contract(contract_text: str, instructions: str) -> str:
+    """
+    Analyze a long contract with a parallel map-reduce over chunks.
+
+    The contract is split into ~4000-token chunks at paragraph boundaries,
+    each chunk is analyzed by its own LLM call, and a final call merges the
+    partial analyses into one report. The per-chunk calls run concurrently
+    with asyncio.gather, so total latency is roughly the slowest chunk plus
+    the merge call - not the sum of all calls. This also avoids the output
+    truncation a single call hits on very long documents.
+
+    Args:
+        contract_text: The full extracted contract text
+        instructions: The user's additional analysis guidelines
+
+    Returns:
+        str: The merged analysis report
+    """
+    # Clause-aware splitting: chunks break where clauses begin, so no
+    # obligation is analyzed half in one chunk and half in the next
+    chunks = chunk_content(contract_text, model="gpt-4o", max_tokens=CHUNK_TOKENS)
+
+    # Map step: analyze every chunk concurrently (call_llm_api_many caps
+    # how many requests are in flight so we don't trip rate limits)
+    prompts = [
+        format_prompt_cached(
+            analysis_type="Avaliação de Contrato de Compra e Venda de Imóveis",
+            content=chunk,
+            instructions=instructions
+        )
+        for chunk in chunks
+    ]
+    partials = await call_llm_api_many(
+        prompts, model="gpt-4o", temperature=0.0, max_tokens=2000
+    )
+
+    # Reduce step: merge the partial reports into a single coherent one
+    merged_input = "\n\n---\n\n".join(
+        f"[Análise da seção {i + 1} de {len(partials)}]\n{p}"
+        for i, p in enumerate(partials)
+    )
+    merge_prompt = (
+        "As análises a seguir cobrem seções consecutivas de um mesmo contrato "
+        "de compra e venda de imóvel. Consolide-as em um único relatório "
+        "coerente, mantendo a mesma estrutura e o mesmo idioma das análises, "
+        "eliminando repetições e resolvendo eventuais contradições.\n\n"
+        f"{merged_input}"
+    )
+    return await call_llm_api_async(
+        prompt=merge_prompt,
+        model="gpt-4o",
+        temperature=0.0,
+        max_tokens=2000
+    )
+
 # --- Main App ---
 
 def main():
@@ -168,7 +337,10 @@ def main():
         import logging
         logging.warning(f"Domain check warning: {str(e)}")
     
-    # Apply the custom CSS styling defined earlier
+    # Apply the custom CSS styling defined earlier. This must run on every
+    # rerun: Streamlit removes elements that aren't re-emitted, so a style
+    # block injected only once would vanish on the next interaction and
+    # the hidden menu/footer/header would reappear
     # unsafe_allow_html=True is needed because we're injecting custom HTML/CSS
     st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
@@ -183,9 +355,6 @@ def main():
         st.error("OpenAI API key not found. Please add it to `.streamlit/secrets.toml`.")
         st.info("Example:\n[default]\nOPENAI_API_KEY = \"your-api-key-here\"")
         return  # Exit the function early if no API key
-    
-    # Set the API key as an environment variable so the OpenAI library can use it
-    os.environ["OPENAI_API_KEY"] = api_key
 
     # --- Create the sidebar for user inputs ---
     # Streamlit's 'with' statement creates a new container for UI elements
@@ -204,11 +373,18 @@ def main():
             accept_multiple_files=False      # Only allow one file at a time
         )
         
-        # Check if the uploaded file is too large (2MB limit)
+        # Check if the uploaded file is too large (2MB limit).
+        # The server already rejects oversized uploads at the HTTP layer via
+        # maxUploadSize in .streamlit/config.toml; this is a fallback for
+        # deployments running without that config file.
         if uploaded_file is not None and uploaded_file.size > 2 * 1024 * 1024:  # 2MB in bytes
             st.error("Error: The uploaded file exceeds the 2MB size limit. Please upload a smaller file.")
             uploaded_file = None  # Reset the file to None so it's not processed
-            
+
+        # Batch mode routes the request through OpenAI's Batch API: half the
+        # price, but the answer arrives later (up to 24h, usually much sooner)
+        batch_mode = st.checkbox("Batch mode (50% cheaper, slower)")
+
     # Add the "Run Analysis" button to the sidebar
     # type="primary" makes it blue, use_container_width=True makes it full width
     run_analysis = st.sidebar.button("Run Analysis", type="primary", use_container_width=True)
@@ -240,49 +416,135 @@ def main():
     if "llm_response" not in st.session_state:
         st.session_state.llm_response = "Results will appear here after analysis."
 
+    # Tracks whether this rerun already rendered the answer while streaming,
+    # so we don't draw it twice below
+    streamed_this_run = False
+
     # Handle the analysis process when the button is clicked
     if run_analysis:
         if not uploaded_file:
             # Remind user to upload a file if they haven't
             st.warning("Please upload a PDF file first.")
         else:
-            # Extract text from the PDF using our helper function
-            contract_text = extract_text_from_pdf(uploaded_file)
-            if not contract_text.strip():  # .strip() removes whitespace, checking if any text remains
-                # Show error if no text could be extracted
-                st.error("Could not extract text from the PDF. Please check the file.")
+            # Hash the upload + instructions first: if this exact analysis
+            # already ran this session (e.g. the user re-uploaded a file they
+            # analyzed earlier), the stored answer is reused without touching
+            # the PDF parser or the API
+            file_bytes = uploaded_file.getvalue()
+            responses = st.session_state.setdefault("responses", {})
+            key = _response_key(file_bytes, instructions)
+            if not batch_mode and key in responses:
+                st.session_state.llm_response = responses[key]
             else:
-                # Show a spinner while processing (gives visual feedback during wait)
-                with st.spinner("Analyzing contract..."):
-                    # Format the prompt for the AI using our utility function
-                    # This prepares the text to be sent to the AI model
-                    prompt = format_prompt(
-                        analysis_type="Avaliação de Contrato de Compra e Venda de Imóveis",  # Type of analysis to perform
-                        content=contract_text,        # The extracted contract text
-                        instructions=instructions     # User's custom instructions
-                    )
+                # Extract text from the PDF using our helper function,
+                # reusing the bytes already read for the cache key above
+                contract_text = extract_text_from_pdf(file_bytes)
+                if not contract_text.strip():  # .strip() removes whitespace, checking if any text remains
+                    # Show error if no text could be extracted
+                    st.error("Could not extract text from the PDF. Please check the file.")
+                elif batch_mode:
                     try:
-                        # Call the AI model to analyze the contract
-                        response = call_llm_api(
+                        # Queue the analysis instead of running it live; the
+                        # batch id is kept so later reruns can poll for the result.
+                        # Only this branch needs the single full prompt - the
+                        # chunked and streaming paths build their own - so it
+                        # is rendered here rather than once per run for
+                        # everyone (cached: reruns with the same contract skip
+                        # re-assembling the multi-KB prompt)
+                        prompt = format_prompt_cached(
+                            analysis_type="Avaliação de Contrato de Compra e Venda de Imóveis",
+                            content=contract_text,
+                            instructions=instructions
+                        )
+                        st.session_state.batch_id = submit_batch_analysis(
                             prompt=prompt,
-                            model="gpt-4o",      # Using GPT-4 for high-quality analysis
-                            temperature=0.0,    # 0.0 means more deterministic/factual responses
-                            max_tokens=2000     # Limit response length to 2000 tokens
+                            model="gpt-4o",
+                            temperature=0.0,
+                            max_tokens=2000
                         )
-                        # Store the response in session state so it persists
+                        st.info("Batch job submitted. The result will appear here once it completes.")
+                    except Exception as e:
+                        st.error(f"Could not submit batch job: {e}")
+                elif count_tokens(contract_text, model="gpt-4o") > CHUNK_TOKENS:
+                    # Long contract: analyze chunks in parallel, then merge.
+                    # (Streaming doesn't apply here - the answer is assembled
+                    # from several concurrent calls.)
+                    with st.spinner("Analyzing contract in sections..."):
+                        try:
+                            response = asyncio.run(
+                                _analyze_large_contract(contract_text, instructions)
+                            )
+                            st.session_state.llm_response = response
+                            # Cache only clean reports - a merged report
+                            # with per-section error strings should be
+                            # retried on the next run, not replayed
+                            if not _is_error_response(response):
+                                responses[key] = response
+                        except Exception as e:
+                            st.session_state.llm_response = f"Error: {e}"
+                else:
+                    try:
+                        # Stream the analysis: tokens render as they arrive
+                        # from the API, so the user sees the answer start in
+                        # under a second instead of staring at a spinner for
+                        # the full completion time. The constant analysis
+                        # instructions travel as the system message, where
+                        # OpenAI's prompt-prefix cache halves their cost on
+                        # repeat analyses; only the contract text varies.
+                        system_message, user_message = format_prompt_parts(
+                            analysis_type="Avaliação de Contrato de Compra e Venda de Imóveis",
+                            content=contract_text,
+                            instructions=instructions
+                        )
+                        response = st.write_stream(call_llm_api_stream(
+                            prompt=user_message,
+                            model="gpt-4o",
+                            temperature=0.0,
+                            max_tokens=2000,
+                            system=system_message
+                        ))
+                        streamed_this_run = True
+                        # Store the response so it persists and future
+                        # identical requests skip the API entirely.
+                        # Streaming failures arrive as yielded text, not
+                        # exceptions - never cache those
                         st.session_state.llm_response = response
+                        if not _is_error_response(response):
+                            responses[key] = response
                     except Exception as e:
                         # Handle any errors that occur during API call
                         st.session_state.llm_response = f"Error: {e}"
 
-    # Display the analysis results in a text area
-    # The height parameter makes it large enough to show substantial results
-    st.text_area(
-        "AI Analysis Output:",               # Label above the text area
-        value=st.session_state.llm_response,  # Content to display (from session state)
-        height=400,                          # Height in pixels
-        key="llm_response_display"           # Unique key for this element
-    )
+    # If a batch job is pending, poll it on each rerun and surface the result
+    # once the Batch API has finished processing it
+    if st.session_state.get("batch_id"):
+        try:
+            status, result = check_batch_analysis(st.session_state.batch_id)
+            if result is not None:
+                st.session_state.llm_response = result
+                del st.session_state.batch_id
+            elif status in ("failed", "expired", "cancelled"):
+                st.error(f"Batch job {status}. Please run the analysis again.")
+                del st.session_state.batch_id
+            else:
+                st.info(f"Batch job in progress (status: {status}).")
+                st.button("Check batch status")  # Clicking triggers a rerun, which re-polls
+        except Exception as e:
+            # Drop the batch id too: a job that raises here (e.g. completed
+            # with every request failed, so there is no output file) would
+            # otherwise re-raise on every rerun, leaving the user stuck
+            # behind a permanent error banner with no way to start over
+            st.error(f"Could not check batch job: {e}")
+            del st.session_state.batch_id
+
+    # Display the analysis results (skipped on the rerun that just streamed
+    # them, where st.write_stream already rendered the answer).
+    # st.markdown renders read-only, which is cheaper on both ends than the
+    # old editable st.text_area: no per-rerun synchronization of a large
+    # editable widget, and the model's markdown formatting actually renders.
+    if not streamed_this_run:
+        with st.container(border=True):
+            st.markdown(st.session_state.llm_response)
 
     # Footer section with privacy note
     st.markdown("---")  # Horizontal rule (divider line)
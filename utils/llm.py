@@ -11,36 +11,66 @@ Created: 2025
 
 # Standard library imports
 import os                  # For accessing environment variables and file operations
+import time                # For polling batch jobs until completion
+import json                # For building Batch API request files
+import asyncio             # For running provider calls concurrently
 import logging             # For logging errors and information during execution
-from typing import Dict, Any, Optional  # For type hints to make code more readable and maintainable
+from dataclasses import dataclass  # Immutable request objects for the provider dispatch
+from functools import cache, lru_cache  # Memoize API-key lookups and client singletons
+from typing import Dict, Iterator  # For type hints to make code more readable and maintainable
 
 # Third-party LLM API libraries
+import httpx               # HTTP client underlying the OpenAI SDK (for timeout config)
 import openai              # Python client for the OpenAI API
-from openai import OpenAI  # The main client class for OpenAI API
+from openai import OpenAI, AsyncOpenAI  # Sync and async client classes for the OpenAI API
+from tenacity import (     # Retry/backoff around transient API failures
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+# Sibling modules: persistent response cache and prompt assembly
+from utils import llm_cache
+from utils import semantic_cache
+from utils.prompt import format_multi_prompt, count_tokens
 # Note: Anthropic is imported conditionally when needed
 
-# Configure logging
-# This sets up the logging system to show INFO level messages and above
-# (INFO, WARNING, ERROR, CRITICAL)
-logging.basicConfig(level=logging.INFO)
-# Create a logger specific to this module
+# orjson parses large JSON responses several times faster than the
+# stdlib; it is optional, and the stdlib keeps everything working when
+# it is not installed
+try:
+    import orjson
+
+    def _json_loads(data):
+        return orjson.loads(data)
+except ImportError:
+    _json_loads = json.loads
+
+# Create a logger specific to this module. Logging configuration (levels,
+# handlers) is left to the application entry point - a library module
+# calling basicConfig would mutate global state for every importer.
 logger = logging.getLogger(__name__)  # __name__ will be 'utils.llm'
 
-def get_api_key(provider: str) -> str:
+# Whether the .env file has already been loaded into os.environ; the load
+# touches the filesystem, so do it at most once per process
+_dotenv_loaded = False
+
+def _get_api_key_uncached(provider: str) -> str:
     """
     Retrieve API key for the specified LLM provider from various possible sources.
-    
+
     This function tries multiple methods to find an API key in this order:
     1. Environment variables (already set in the current session)
     2. .env file in the project directory
     3. Streamlit secrets (if running in a Streamlit app)
-    
+
     Args:
         provider (str): The LLM provider name ('openai', 'anthropic', etc.)
-        
+
     Returns:
         str: The API key if found, or an empty string if not found
-        
+
     Note for beginners:
         API keys are like passwords that let your application use AI services.
         They should be kept secret and never shared or committed to public repositories.
@@ -65,14 +95,16 @@ def get_api_key(provider: str) -> str:
             
             
         # If not found in environment, try other methods
-        # Import these libraries only when needed (to avoid unnecessary imports)
-        import streamlit as st
-        from dotenv import load_dotenv
-        
         # Load environment variables from .env file
         # A .env file is a simple text file that contains KEY=VALUE pairs
-        # The load_dotenv() function reads this file and adds its contents to os.environ
-        load_dotenv()
+        # The load_dotenv() function reads this file and adds its contents
+        # to os.environ. This runs at most once per process - the flag
+        # keeps repeat lookups off the filesystem.
+        global _dotenv_loaded
+        if not _dotenv_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _dotenv_loaded = True
         
         # Try environment variables again after loading .env
         # Now that we've loaded the .env file, check again for our API keys
@@ -86,7 +118,10 @@ def get_api_key(provider: str) -> str:
             
         # Try Streamlit secrets as last resort
         # Streamlit secrets are stored in .streamlit/secrets.toml
+        # streamlit alone costs hundreds of milliseconds to import, so it
+        # is only pulled in when every cheaper source has come up empty
         try:
+            import streamlit as st
             # Check both the default section and the root level of secrets
             if provider.lower() == "openai":
                 # The 'or' operator returns the first non-False value
@@ -111,20 +146,310 @@ def get_api_key(provider: str) -> str:
         logger.error(f"Error getting API key: {str(e)}", exc_info=True)
         return ""  # Return empty string to indicate failure
 
+@lru_cache(maxsize=4)
+def _get_api_key_cached(provider: str) -> str:
+    """Memoized wrapper so the miss path (dotenv load, secrets parse) runs once."""
+    return _get_api_key_uncached(provider)
+
+def get_api_key(provider: str) -> str:
+    """
+    Retrieve (and cache) the API key for the specified LLM provider.
+
+    The underlying lookup can touch the filesystem twice (.env load, TOML
+    secrets parse), which is pointless to repeat on every API call. Keys
+    are cached per provider; failed lookups are not pinned, so adding a
+    key to the environment takes effect on the next call.
+
+    Args:
+        provider (str): The LLM provider name ('openai', 'anthropic', etc.)
+
+    Returns:
+        str: The API key if found, or an empty string if not found
+    """
+    key = _get_api_key_cached(provider.lower())
+    if not key:
+        # Don't let a lookup failure stick in the cache - the user may set
+        # the key and retry without restarting the app
+        _get_api_key_cached.cache_clear()
+    return key
+
+def refresh_credentials() -> None:
+    """
+    Forget cached API keys so the next call re-reads the environment.
+
+    Call this after rotating a key at runtime; otherwise the cached value
+    is used for the lifetime of the process.
+    """
+    _get_api_key_cached.cache_clear()
+
+# Connection pool sizing shared by both transports: generous keepalive so
+# concurrent chunk analyses reuse warm connections instead of opening new ones
+_HTTPX_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+# Read/connect budget for one request; a wedged connection shouldn't hang
+# an analysis indefinitely
+_HTTPX_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+@cache
+def _httpx_client() -> httpx.Client:
+    """
+    Build (once per worker) the shared HTTP transport for sync calls.
+
+    http2=True lets concurrent requests multiplex over a single TCP+TLS
+    connection instead of opening one connection each - the handshakes are
+    the dominant fixed cost of a short API call.
+
+    Returns:
+        httpx.Client: The shared transport
+    """
+    return httpx.Client(http2=True, limits=_HTTPX_LIMITS, timeout=_HTTPX_TIMEOUT)
+
+@cache
+def get_openai_client() -> OpenAI:
+    """
+    Build (once per worker) the shared OpenAI client.
+
+    Creating a client per call pays TLS handshake and connection setup
+    (~100-300ms) every time. Caching the client - and routing it over the
+    shared HTTP/2 transport - keeps its connection pool alive across calls
+    and reruns, so that cost is paid once per worker lifetime.
+
+    Returns:
+        OpenAI: The shared client instance
+    """
+    return OpenAI(
+        api_key=get_api_key("openai"),
+        http_client=_httpx_client(),
+        max_retries=0,  # Retries are handled by the tenacity policy below
+    )
+
+# Async clients, one per event loop. These cannot be @cache'd like the
+# sync client: the app drives async work with one asyncio.run() per
+# chunked analysis, and an httpx.AsyncClient's pooled keepalive
+# connections stay bound to the loop that opened them - awaiting them
+# from the next loop fails with "Event loop is closed".
+_ASYNC_CLIENTS: Dict[object, AsyncOpenAI] = {}
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Build (once per event loop) the async OpenAI client.
+
+    Same pooled-transport rationale as get_openai_client, but scoped to
+    the running event loop rather than the worker: connections opened
+    under an earlier, now-closed loop cannot be reused by a later one.
+    Within one loop - which is where the concurrent chunk calls actually
+    happen - the pool is still shared. Entries for closed loops are
+    pruned so long sessions don't accumulate dead pools.
+
+    Returns:
+        AsyncOpenAI: The client bound to the current event loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None:
+        for stale in [l for l in _ASYNC_CLIENTS if l.is_closed()]:
+            del _ASYNC_CLIENTS[stale]
+        client = AsyncOpenAI(
+            api_key=get_api_key("openai"),
+            http_client=httpx.AsyncClient(
+                http2=True, limits=_HTTPX_LIMITS, timeout=_HTTPX_TIMEOUT
+            ),
+            max_retries=0,  # Retries are handled by the tenacity policy below
+        )
+        _ASYNC_CLIENTS[loop] = client
+    return client
+
+@cache
+def get_anthropic_client():
+    """
+    Build (once) the shared Anthropic client.
+
+    The anthropic package is an optional dependency, imported here
+    lazily - module load stays fast and the app works without it as long
+    as no Claude model is requested. The singleton also means one warm
+    connection pool instead of a new TLS handshake per call. (The bare
+    `anthropic.Anthropic(...)` this replaces referenced a module that was
+    never imported and crashed on first use.)
+
+    Returns:
+        anthropic.Anthropic: The shared client instance
+    """
+    import anthropic
+    return anthropic.Anthropic(api_key=get_api_key("anthropic"))
+
+# Errors worth retrying: rate limits and connection/timeout hiccups are
+# transient; anything else (bad request, auth) would fail identically again
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+)
+
+# Shared retry policy: up to 5 attempts with jittered exponential backoff
+# (capped at 30 s between attempts). Without this, a single transient
+# 429/500 surfaced as an error to the user, who then had to re-click and
+# wait through the whole pipeline again.
+_llm_retry = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(initial=1, max=30),
+    retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+    reraise=True,
+)
+
+@_llm_retry
+def _create_chat_completion(client, **params):
+    """Issue one chat-completion request, retrying transient failures."""
+    return client.chat.completions.create(**params)
+
+@_llm_retry
+async def _acreate_chat_completion(client, **params):
+    """Async counterpart of _create_chat_completion."""
+    return await client.chat.completions.create(**params)
+
+@cache
+def _create_anthropic_message_retrying():
+    """
+    Build (once) the retry-wrapped Anthropic message call.
+
+    The anthropic package is an optional dependency imported lazily, so
+    its exception classes are not available at module scope for the
+    shared policy above. This constructs the equivalent policy - same
+    attempts, same backoff, retrying only the transient error classes -
+    the first time an Anthropic call is made.
+
+    Returns:
+        The retrying callable taking (client, **params)
+    """
+    import anthropic
+
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_exponential_jitter(initial=1, max=30),
+        retry=retry_if_exception_type((
+            anthropic.RateLimitError,
+            anthropic.APITimeoutError,
+            anthropic.APIConnectionError,
+        )),
+        reraise=True,
+    )
+    def _create(client, **params):
+        # anthropic==0.8.1 only exposes the Messages API under the beta
+        # namespace; client.messages does not exist until later releases
+        return client.beta.messages.create(**params)
+
+    return _create
+
+# Context window sizes (tokens) for the models this app targets; used to
+# cap how much output budget a request reserves. Unknown models fall back
+# to a conservative 8K window.
+_MODEL_CTX = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "claude-3-opus-20240229": 200000,
+    "claude-3-sonnet-20240229": 200000,
+    "claude-3-haiku-20240307": 200000,
+}
+
+def _effective_max_tokens(model: str, prompt: str, max_tokens: int, system: str = "") -> int:
+    """
+    Fit the output budget to what the context window actually leaves.
+
+    A constant max_tokens both over-reserves on short prompts (rate
+    limiters count the reservation against tokens-per-minute, lowering
+    effective parallelism) and overflows the context window on long
+    ones, failing the request outright. This caps the requested budget
+    at the window minus the prompt, with a small safety margin for
+    message framing overhead.
+
+    Args:
+        model: The full model name
+        prompt: The user prompt about to be sent
+        max_tokens: The caller's requested output budget
+        system: The system message, if any
+
+    Returns:
+        int: The output budget to actually request (at least 256)
+    """
+    ctx = _MODEL_CTX.get(model, 8192)
+    available = ctx - count_tokens(prompt, model) - count_tokens(system, model) - 64
+    # Never go below a floor that still fits a useful answer; genuinely
+    # oversized contracts are handled by the chunking path upstream
+    return max(min(max_tokens, available), 256)
+
+@dataclass(frozen=True)
+class LLMRequest:
+    """
+    One LLM request, carried as a single immutable object.
+
+    The provider helpers used to take five positional parameters plus a
+    **kwargs splat that was repacked into a fresh dict at every hop.
+    A frozen dataclass avoids the per-call dict rebuilding, and -
+    because extra provider options are stored as a sorted tuple of
+    pairs rather than a dict - the whole request is hashable.
+    (slots=True would shave a little more per-access, but dataclass
+    slots need Python 3.10+ and the Docker image runs 3.9.)
+
+    Attributes:
+        prompt: The text prompt to send to the model
+        model: The full model name (e.g., 'gpt-4o', 'claude-3-opus')
+        temperature: Controls randomness (0.0 to 1.0)
+        max_tokens: Maximum response length
+        system: System message override; empty means the generic default
+        extra: Additional provider options as sorted (name, value) pairs
+    """
+    prompt: str
+    model: str
+    temperature: float
+    max_tokens: int
+    system: str = ""
+    extra: tuple = ()
+
+    @classmethod
+    def create(cls, prompt: str, model: str, temperature: float, max_tokens: int, **kwargs) -> "LLMRequest":
+        """Build a request, normalizing keyword options into the extra tuple."""
+        system = kwargs.pop("system", "")
+        return cls(prompt, model, temperature, max_tokens, system, tuple(sorted(kwargs.items())))
+
+    def extra_kwargs(self) -> dict:
+        """Return the extra provider options as keyword arguments."""
+        return dict(self.extra)
+
+def _response_text(content: str) -> str:
+    """
+    Return the response text, stripping only when there is whitespace.
+
+    Responses are usually multi-KB and already trimmed; an unconditional
+    strip() would copy the whole string just to remove nothing. The
+    boundary check keeps the common case copy-free.
+
+    Args:
+        content: The raw response content
+
+    Returns:
+        str: The trimmed response text
+    """
+    if content[:1].isspace() or content[-1:].isspace():
+        return content.strip()
+    return content
+
 def call_llm_api(
     prompt: str,
     model: str = "gpt-3.5-turbo",  # Default model if none specified
     temperature: float = 0.7,      # Controls randomness/creativity
     max_tokens: int = 2000,        # Limits response length
+    stream: bool = False,          # Yield the response incrementally?
     **kwargs                       # Allows passing additional parameters
-) -> str:
+):
     """
     Call the appropriate LLM API based on the model name.
-    
+
     This function serves as a unified interface to different AI models.
     It automatically detects which provider to use based on the model name
     and handles the specific API calls accordingly.
-    
+
     Args:
         prompt (str): The text prompt to send to the AI model
         model (str): Which AI model to use (e.g., 'gpt-4', 'claude-3-opus')
@@ -133,39 +458,80 @@ def call_llm_api(
             - 0.7: Balanced (default)
             - 1.0: Very creative/random
         max_tokens (int): Maximum length of response (roughly 4 chars per token)
+        stream (bool): If True, return an iterator of response chunks instead
+            of blocking for the full completion. Waiting for a full 2000-token
+            answer takes tens of seconds; streaming delivers the first tokens
+            in well under a second so the UI can render as they arrive.
         **kwargs: Any additional parameters to pass to the specific API
-        
+
     Returns:
-        str: The AI model's response text, or an error message if something fails
-        
+        str: The AI model's response text, or an error message if something fails.
+        With stream=True, an iterator of str chunks instead.
+
     Note for beginners:
         This function handles all the complexity of talking to different AI services.
         You just need to provide a prompt and specify which model you want to use.
-        
+
         What are tokens? Tokens are pieces of text that the AI processes. They're roughly
         4 characters each in English, so 100 tokens ≈ 75 words. Both your prompt and the
         AI's response count toward token usage, which affects API costs.
     """
     try:
-        # Determine provider based on model name prefix
-        # Each AI provider uses specific naming conventions for their models
-        if model.startswith("gpt"):
-            # OpenAI models start with "gpt" (e.g., "gpt-4", "gpt-3.5-turbo")
-            return _call_openai(prompt, model, temperature, max_tokens, **kwargs)
-        elif model.startswith("claude"):
-            # Anthropic models start with "claude" (e.g., "claude-3-opus")
-            return _call_anthropic(prompt, model, temperature, max_tokens, **kwargs)
-        else:
+        # Deterministic, non-streamed requests consult the persistent disk
+        # cache first: identical analyses (same prompt, model and limits)
+        # then skip the network entirely. temperature > 0 is expected to
+        # vary between runs, so those requests always go to the provider.
+        cacheable = not stream and temperature == 0
+        prompt_embedding = None
+        if cacheable:
+            key = llm_cache.cache_key(model, prompt, temperature, max_tokens, kwargs.get("system", ""))
+            cached = llm_cache.get(key)
+            if cached is not None:
+                return cached
+            # Near-duplicate prompts (lightly edited contract, rephrased
+            # query) miss the exact cache but still deserve a hit; the
+            # semantic cache matches them by embedding similarity among
+            # entries produced under the same model/limits/system. The
+            # embedding comes back so a miss can store the fresh answer
+            # without embedding the prompt again.
+            semantic, prompt_embedding = semantic_cache.lookup(
+                prompt, model, max_tokens, kwargs.get("system", "")
+            )
+            if semantic is not None:
+                llm_cache.set(key, semantic)
+                return semantic
+
+        # Streamed requests go through the dedicated streaming entry point
+        if stream:
+            return call_llm_api_stream(prompt, model, temperature, max_tokens, **kwargs)
+
+        # Determine provider from the model name prefix via the registry
+        # (each AI provider uses specific naming conventions for its models)
+        provider_call = _PROVIDER_DISPATCH.get(_model_prefix(model))
+        if provider_call is None:
             # If the model name doesn't match any known provider, log an error
             logger.error(f"Unsupported model: {model}")
             return f"Error: Unsupported model '{model}'"
+        # Trim the output reservation to what the context window leaves
+        # (a separate local so the caches keep keying on the caller's
+        # requested budget, same as the exact cache key above)
+        effective_max = _effective_max_tokens(model, prompt, max_tokens, kwargs.get("system", ""))
+        result = provider_call(LLMRequest.create(prompt, model, temperature, effective_max, **kwargs))
+
+        # Store successful answers for next time (never the error strings)
+        if cacheable and isinstance(result, str) and not result.startswith("Error"):
+            llm_cache.set(key, result)
+            semantic_cache.store(
+                prompt_embedding, result, model, max_tokens, kwargs.get("system", "")
+            )
+        return result
     except Exception as e:
         # Catch and log any errors that occur during the API call
         logger.error(f"Error calling LLM API: {str(e)}")
         # Return a user-friendly error message
         return f"Error calling LLM API: {str(e)}"
 
-def _call_openai(
+async def _async_call_openai(
     prompt: str,
     model: str,
     temperature: float,
@@ -173,22 +539,343 @@ def _call_openai(
     **kwargs
 ) -> str:
     """
-    Call the OpenAI API with the given parameters.
-    
-    This is a private helper function (note the _ prefix) that handles
-    the specifics of calling OpenAI's API. It's called by the main
-    call_llm_api function when an OpenAI model is requested.
-    
+    Async counterpart of _call_openai.
+
+    The API round-trip is pure network wait, so an async call lets the
+    event loop run other work (most usefully: more LLM calls on other
+    chunks of the same contract) while this one is in flight.
+
     Args:
         prompt: The text prompt to send to the model
         model: Which OpenAI model to use (e.g., 'gpt-4', 'gpt-3.5-turbo')
         temperature: Controls randomness (0.0 to 1.0)
         max_tokens: Maximum response length
         **kwargs: Additional parameters for the OpenAI API
-        
+
     Returns:
         str: The model's response or an error message
-        
+    """
+    try:
+        api_key = get_api_key("openai")
+        if not api_key:
+            error_msg = "OpenAI API key not found. Please set it in .streamlit/secrets.toml or .env file."
+            logger.error(error_msg)
+            return f"Error: {error_msg}"
+
+        # A system override travels as a kwarg (like the sync path's
+        # LLMRequest.system); it belongs in the messages list, not in the
+        # create() call, which would reject it as an unknown parameter
+        system = kwargs.pop("system", "") or "You are a helpful assistant that analyzes contracts."
+
+        # Reuse the shared client so concurrent chunk calls multiplex over
+        # its pooled connections instead of each opening their own
+        client = get_async_openai_client()
+        response = await _acreate_chat_completion(
+            client,
+            model=model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+
+        if not response.choices or not response.choices[0].message.content:
+            return "Error: No response content from the model."
+        return _response_text(response.choices[0].message.content)
+
+    except Exception as e:
+        error_msg = f"OpenAI API error: {str(e)}"
+        logger.error(error_msg)
+        return f"Error: {error_msg}"
+
+async def call_llm_api_async(
+    prompt: str,
+    model: str = "gpt-3.5-turbo",
+    temperature: float = 0.7,
+    max_tokens: int = 2000,
+    **kwargs
+) -> str:
+    """
+    Async version of call_llm_api, for callers running inside an event loop.
+
+    Use this when several independent prompts (e.g., per-section analyses of
+    one contract) should be in flight at the same time: awaiting them with
+    asyncio.gather overlaps the network waits, so total latency approaches
+    the slowest single call instead of the sum of all calls.
+
+    Args:
+        prompt: The text prompt to send to the AI model
+        model: Which AI model to use (e.g., 'gpt-4', 'claude-3-opus')
+        temperature: Controls randomness in the response
+        max_tokens: Maximum length of response
+        **kwargs: Any additional parameters to pass to the specific API
+
+    Returns:
+        str: The AI model's response text, or an error message if something fails
+    """
+    try:
+        # Same cache discipline as the sync path: deterministic requests
+        # consult the disk cache and store successful answers. (The
+        # semantic cache is skipped here - its embeddings call is
+        # synchronous and would stall the event loop for every chunk.)
+        cacheable = temperature == 0
+        if cacheable:
+            key = llm_cache.cache_key(model, prompt, temperature, max_tokens, kwargs.get("system", ""))
+            cached = llm_cache.get(key)
+            if cached is not None:
+                return cached
+
+        # Trim the output reservation to what the context window leaves,
+        # exactly as call_llm_api does
+        effective_max = _effective_max_tokens(model, prompt, max_tokens, kwargs.get("system", ""))
+
+        if model.startswith("gpt"):
+            result = await _async_call_openai(prompt, model, temperature, effective_max, **kwargs)
+        elif model.startswith("claude"):
+            # The Anthropic path is still synchronous; run it in a worker
+            # thread so it doesn't block the event loop
+            result = await asyncio.to_thread(
+                _call_anthropic,
+                LLMRequest.create(prompt, model, temperature, effective_max, **kwargs),
+            )
+        else:
+            logger.error(f"Unsupported model: {model}")
+            return f"Error: Unsupported model '{model}'"
+
+        # Store successful answers for next time (never the error strings)
+        if cacheable and isinstance(result, str) and not result.startswith("Error"):
+            llm_cache.set(key, result)
+        return result
+    except Exception as e:
+        logger.error(f"Error calling LLM API: {str(e)}")
+        return f"Error calling LLM API: {str(e)}"
+
+# Upper bound on simultaneously in-flight LLM requests. Fanning out an
+# unbounded number of calls mostly trades latency for rate-limit errors;
+# a small ceiling keeps throughput high without tripping provider limits.
+MAX_CONCURRENCY = 8
+
+async def call_llm_api_many(
+    prompts: list,
+    model: str = "gpt-3.5-turbo",
+    temperature: float = 0.7,
+    max_tokens: int = 2000,
+    **kwargs
+) -> list:
+    """
+    Run several independent prompts concurrently and collect the answers.
+
+    The prompts are dispatched together under a semaphore, so wall-clock
+    time approaches the slowest single call instead of the sum of all
+    calls - typically a several-fold speedup when one contract needs
+    multiple analyses (per-chunk, or summary/risk/compliance passes).
+
+    Args:
+        prompts: The prompt texts, one per request
+        model: Which AI model to use for every request
+        temperature: Controls randomness in the responses
+        max_tokens: Maximum length per response
+        **kwargs: Any additional parameters to pass to the specific API
+
+    Returns:
+        list: One response string per prompt, in the same order. A request
+        that raised is represented by its error message, matching the
+        error-string convention of call_llm_api.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def _dispatch(prompt: str) -> str:
+        # The semaphore caps how many requests are in flight at once
+        async with semaphore:
+            return await call_llm_api_async(
+                prompt, model=model, temperature=temperature,
+                max_tokens=max_tokens, **kwargs
+            )
+
+    tasks = [asyncio.create_task(_dispatch(p)) for p in prompts]
+    # return_exceptions=True keeps one failed chunk from cancelling the rest
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return [
+        f"Error calling LLM API: {r}" if isinstance(r, BaseException) else r
+        for r in results
+    ]
+
+def _stream_openai_response(client, model, messages, temperature, max_tokens, **kwargs):
+    """
+    Generator yielding the text chunks of a streamed OpenAI completion.
+
+    OpenAI sends streamed responses as a sequence of deltas over a single
+    connection; each delta carries a few tokens of text. Yielding them as
+    they arrive lets the UI show the answer growing instead of waiting for
+    the whole completion.
+
+    Args:
+        client: An OpenAI client instance
+        model: Which OpenAI model to use
+        messages: The chat messages to send
+        temperature: Controls randomness (0.0 to 1.0)
+        max_tokens: Maximum response length
+        **kwargs: Additional parameters for the OpenAI API
+
+    Yields:
+        str: Successive chunks of the response text
+    """
+    try:
+        stream = _create_chat_completion(
+            client,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,  # Ask for Server-Sent Events instead of one response
+            **kwargs
+        )
+        for chunk in stream:
+            # Some keep-alive chunks carry no choices/content; skip those
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        # Surface the error as the last chunk so the UI still shows
+        # something. The leading newline matters: the chunk may land after
+        # partial text, and the app's error detector looks for "Error:" at
+        # the start of a line - without the newline a truncated answer
+        # with the error glued on would pass for a good response.
+        error_msg = f"OpenAI API error: {str(e)}"
+        logger.error(error_msg)
+        yield f"\nError: {error_msg}"
+
+def _call_openai_stream(
+    prompt: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    **kwargs
+) -> Iterator[str]:
+    """
+    Streamed counterpart of _call_openai.
+
+    Args:
+        prompt: The text prompt to send to the model
+        model: Which OpenAI model to use
+        temperature: Controls randomness (0.0 to 1.0)
+        max_tokens: Maximum response length
+        **kwargs: Additional parameters for the OpenAI API
+
+    Yields:
+        str: Successive chunks of the response text
+    """
+    api_key = get_api_key("openai")
+    if not api_key:
+        error_msg = "OpenAI API key not found. Please set it in .streamlit/secrets.toml or .env file."
+        logger.error(error_msg)
+        yield f"Error: {error_msg}"
+        return
+
+    system = kwargs.pop("system", "") or "You are a helpful assistant that analyzes contracts."
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+    yield from _stream_openai_response(
+        get_openai_client(), model, messages, temperature, max_tokens, **kwargs
+    )
+
+def _call_anthropic_stream(
+    prompt: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    **kwargs
+) -> Iterator[str]:
+    """
+    Streamed counterpart of _call_anthropic, using the messages stream API.
+
+    Args:
+        prompt: The text prompt to send to the model
+        model: Which Anthropic model to use
+        temperature: Controls randomness (0.0 to 1.0)
+        max_tokens: Maximum response length
+        **kwargs: Additional parameters for the Anthropic API
+
+    Yields:
+        str: Successive chunks of the response text
+    """
+    api_key = get_api_key("anthropic")
+    if not api_key:
+        yield "Error: Anthropic API key not found. Please add it to your .streamlit/secrets.toml file."
+        return
+
+    client = get_anthropic_client()
+    try:
+        # The stream helper manages the connection and exposes plain text
+        # (beta namespace: the 0.8.1 pin has no top-level client.messages)
+        with client.beta.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=[{"role": "user", "content": prompt}],
+            **kwargs
+        ) as stream:
+            for text in stream.text_stream:
+                yield text
+    except Exception as e:
+        logger.error(f"Anthropic API error: {str(e)}")
+        # "Error:" prefix matches the convention shared by every provider
+        # path (and the caches' never-store-errors guard); the leading
+        # newline keeps it detectable when it lands after partial text
+        yield f"\nError: Anthropic API error: {str(e)}"
+
+def call_llm_api_stream(
+    prompt: str,
+    model: str = "gpt-3.5-turbo",
+    temperature: float = 0.7,
+    max_tokens: int = 2000,
+    **kwargs
+) -> Iterator[str]:
+    """
+    Stream a response from the appropriate LLM API as it is generated.
+
+    Same provider dispatch as call_llm_api, but the return value is an
+    iterator of text chunks: the first tokens arrive within hundreds of
+    milliseconds instead of after the full completion, which is what a
+    UI like st.write_stream wants to consume. "".join(...) over the
+    iterator reconstructs the full-response behavior.
+
+    Args:
+        prompt: The text prompt to send to the AI model
+        model: Which AI model to use (e.g., 'gpt-4', 'claude-3-opus')
+        temperature: Controls randomness in the response
+        max_tokens: Maximum length of response
+        **kwargs: Any additional parameters to pass to the specific API
+
+    Returns:
+        Iterator[str]: Successive chunks of the response text
+    """
+    provider_stream = _PROVIDER_DISPATCH_STREAM.get(_model_prefix(model))
+    if provider_stream is None:
+        logger.error(f"Unsupported model: {model}")
+        return iter((f"Error: Unsupported model '{model}'",))
+    # Trim the output reservation to what the context window leaves
+    max_tokens = _effective_max_tokens(model, prompt, max_tokens, kwargs.get("system", ""))
+    return provider_stream(prompt, model, temperature, max_tokens, **kwargs)
+
+def _call_openai(request: LLMRequest) -> str:
+    """
+    Call the OpenAI API for the given request.
+
+    This is a private helper function (note the _ prefix) that handles
+    the specifics of calling OpenAI's API. It's called by the main
+    call_llm_api function when an OpenAI model is requested.
+
+    Args:
+        request: The request to perform
+
+    Returns:
+        str: The model's response or an error message
+
     Note for beginners:
         This function creates a "chat completion" which simulates a conversation
         with the AI. We set up the conversation with a system message (instructions
@@ -202,47 +889,333 @@ def _call_openai(
             error_msg = "OpenAI API key not found. Please set it in .streamlit/secrets.toml or .env file."
             logger.error(error_msg)
             return f"Error: {error_msg}"
-        
-        # Create an OpenAI client with our API key
-        # This client handles the HTTP requests to OpenAI's servers
-        client = OpenAI(api_key=api_key)
-        
+
+        # Reuse the shared client (and its warm connection pool) instead of
+        # paying connection setup on every call
+        client = get_openai_client()
+
+        messages = [
+            # System message sets the behavior/role of the AI. Keeping the
+            # long, constant analysis instructions here (see
+            # format_prompt_parts) puts them in the prompt prefix, which
+            # OpenAI caches automatically once it exceeds 1024 tokens
+            {"role": "system", "content": request.system or "You are a helpful assistant that analyzes contracts."},
+            # User message contains our actual prompt
+            {"role": "user", "content": request.prompt}
+        ]
+
         # Make the actual API call to generate a completion
         # This is where we send our prompt to the AI model and get a response
-        response = client.chat.completions.create(
-            model=model,  # The specific model to use (e.g., "gpt-4")
-            messages=[
-                # System message sets the behavior/role of the AI
-                {"role": "system", "content": "You are a helpful assistant that analyzes contracts."},
-                # User message contains our actual prompt
-                {"role": "user", "content": prompt}
-            ],
-            temperature=temperature,  # Controls randomness of output
-            max_tokens=max_tokens,   # Limits the length of the response
-            **kwargs  # Any additional parameters passed to the function
+        response = _create_chat_completion(
+            client,
+            model=request.model,
+            messages=messages,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+            **request.extra_kwargs()  # Any additional provider options
         )
-        
+
         # Check if we got a valid response with content
         if not response.choices or not response.choices[0].message.content:
             return "Error: No response content from the model."
-            
-        # Extract and return just the text content from the response
-        # strip() removes any leading/trailing whitespace
-        return response.choices[0].message.content.strip()
-        
+
+        # Extract and return just the text content from the response,
+        # trimming whitespace only when there is any to trim
+        return _response_text(response.choices[0].message.content)
+
     except Exception as e:
         # Handle any errors that occur during the API call
         error_msg = f"OpenAI API error: {str(e)}"
         logger.error(error_msg)  # Log the error for debugging
         return f"Error: {error_msg}"  # Return a user-friendly error message
 
-def _call_anthropic(
+def call_llm_api_multi(
+    analysis_types: list,
+    content: str,
+    instructions: str = "",
+    model: str = "gpt-4o",
+    temperature: float = 0.0,
+    max_tokens: int = 4000,
+) -> Dict[str, str]:
+    """
+    Run several analysis types against one contract in a single API call.
+
+    Instead of N calls that each re-send the full contract text, the
+    contract goes over the wire once with one numbered task per analysis
+    type; the model returns a JSON object keyed by analysis type (enforced
+    with response_format json_object). Outbound token count drops by
+    roughly (N-1) times the contract length.
+
+    The app's UI runs one analysis at a time and so never calls this;
+    it is exported for scripted use (and for a future multi-select UI)
+    where several passes over the same contract are wanted at once.
+
+    Args:
+        analysis_types: The analysis type names to run
+        content: The contract content to analyze
+        instructions: Additional user guidelines shared by all tasks
+        model: Which OpenAI model to use (must support JSON response format)
+        temperature: Controls randomness (0.0 to 1.0)
+        max_tokens: Maximum response length PER analysis type; the
+            combined budget requested is this times the number of types,
+            capped to what the context window leaves
+
+    Returns:
+        Dict[str, str]: One response per analysis type. On failure, every
+        requested type maps to the same error message, matching the
+        error-string convention of call_llm_api.
+    """
+    try:
+        api_key = get_api_key("openai")
+        if not api_key:
+            raise RuntimeError("OpenAI API key not found.")
+
+        system_message, user_message = format_multi_prompt(
+            analysis_types, content, instructions
+        )
+
+        # Size the request against the window: the combined reply (one
+        # section per analysis type) must fit alongside the full prompt.
+        # A fixed budget shared by N sections would truncate for N >= 2.
+        ctx = _MODEL_CTX.get(model, 8192)
+        prompt_tokens = count_tokens(system_message, model) + count_tokens(user_message, model)
+        available = ctx - prompt_tokens - 64
+        combined_budget = min(max_tokens * len(analysis_types), available)
+        if combined_budget < 256 * len(analysis_types):
+            # Not enough room for even a minimal answer per section;
+            # better to say so than to return N truncated fragments
+            raise RuntimeError(
+                f"Contract plus {len(analysis_types)} task blocks leave only "
+                f"{max(available, 0)} output tokens in {model}'s context window; "
+                f"split the contract with chunk_content or request fewer analysis types."
+            )
+
+        client = get_openai_client()
+        response = _create_chat_completion(
+            client,
+            model=model,
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_message}
+            ],
+            temperature=temperature,
+            max_tokens=combined_budget,
+            # Guarantees the reply parses as a single JSON object
+            response_format={"type": "json_object"},
+        )
+        # response_format json_object guarantees a bare JSON object -
+        # no strip needed before parsing
+        parsed = _json_loads(response.choices[0].message.content)
+        return {a: parsed.get(a, "") for a in analysis_types}
+    except Exception as e:
+        error_msg = f"Error: OpenAI API error: {str(e)}"
+        logger.error(error_msg)
+        return {a: error_msg for a in analysis_types}
+
+def _submit_batch(
+    prompts,
+    model: str = "gpt-4o",
+    temperature: float = 0.0,
+    max_tokens: int = 2000,
+) -> str:
+    """
+    Upload a JSONL of requests and create one Batch API job for them.
+
+    Args:
+        prompts: The fully formatted prompt texts, one request per prompt
+        model: Which OpenAI model to use
+        temperature: Controls randomness (0.0 to 1.0)
+        max_tokens: Maximum response length per request
+
+    Returns:
+        str: The batch job id
+
+    Raises:
+        Exception: If the API key is missing or the submission fails
+    """
+    if not get_api_key("openai"):
+        raise RuntimeError("OpenAI API key not found.")
+    client = get_openai_client()
+
+    # The Batch API takes a JSONL file where each line is one request;
+    # custom_id records the prompt's position so results can be reordered
+    lines = []
+    for i, prompt in enumerate(prompts):
+        lines.append(json.dumps({
+            "custom_id": f"analysis-{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": [
+                    {"role": "system", "content": "You are a helpful assistant that analyzes contracts."},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            },
+        }))
+    batch_file = client.files.create(
+        file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    logger.info(f"Submitted batch job {batch.id} ({len(lines)} requests)")
+    return batch.id
+
+def _parse_batch_output(output_text: str, count: int):
+    """
+    Turn a batch output file back into responses ordered like the prompts.
+
+    Args:
+        output_text: The JSONL content of the batch's output file
+        count: How many prompts the batch was submitted with
+
+    Returns:
+        list: One response text per prompt; missing results become
+        error strings so positions always line up
+    """
+    results = ["Error: No batch result returned for this prompt."] * count
+    for line in output_text.splitlines():
+        if not line.strip():
+            continue
+        parsed = _json_loads(line)
+        index = int(parsed["custom_id"].rsplit("-", 1)[1])
+        response = parsed.get("response") or {}
+        if response.get("status_code") == 200:
+            content = response["body"]["choices"][0]["message"]["content"]
+            results[index] = content.strip()
+        else:
+            results[index] = f"Error: Batch request failed with status {response.get('status_code')}."
+    return results
+
+def submit_batch_analysis(
     prompt: str,
-    model: str,
-    temperature: float,
-    max_tokens: int,
-    **kwargs
+    model: str = "gpt-4o",
+    temperature: float = 0.0,
+    max_tokens: int = 2000,
 ) -> str:
+    """
+    Submit an analysis through OpenAI's Batch API instead of calling live.
+
+    Batched requests are billed at half the price of synchronous ones and
+    complete within 24 hours (usually much sooner). This suits workflows
+    where the user queues a contract for later review rather than waiting
+    at the screen.
+
+    Args:
+        prompt: The fully formatted prompt text
+        model: Which OpenAI model to use
+        temperature: Controls randomness (0.0 to 1.0)
+        max_tokens: Maximum response length
+
+    Returns:
+        str: The batch job id, to poll later with check_batch_analysis
+
+    Raises:
+        Exception: If the API key is missing or the submission fails
+    """
+    return _submit_batch([prompt], model, temperature, max_tokens)
+
+def call_llm_api_batch(
+    prompts,
+    model: str = "gpt-4o",
+    temperature: float = 0.0,
+    max_tokens: int = 2000,
+    poll_interval: float = 30.0,
+    timeout: float = 24 * 60 * 60,
+):
+    """
+    Run many prompts through the Batch API and wait for all the results.
+
+    Batched requests cost half as much as synchronous ones, so this is
+    the right entry point for non-interactive workloads (overnight
+    queues, bulk re-analysis) where nobody is watching a spinner. The
+    call blocks, polling the job until it finishes - use
+    submit_batch_analysis/check_batch_analysis instead when the caller
+    wants to poll on its own schedule.
+
+    Args:
+        prompts: The fully formatted prompt texts
+        model: Which OpenAI model to use
+        temperature: Controls randomness (0.0 to 1.0)
+        max_tokens: Maximum response length per prompt
+        poll_interval: Seconds between status checks
+        timeout: Give up after this many seconds
+
+    Returns:
+        list: One response text per prompt, in the same order; failed
+        requests become error strings
+
+    Raises:
+        TimeoutError: If the job does not finish within the timeout
+        RuntimeError: If the job fails, expires or is cancelled
+    """
+    prompts = list(prompts)
+    if not prompts:
+        return []
+    batch_id = _submit_batch(prompts, model, temperature, max_tokens)
+    client = get_openai_client()
+
+    deadline = time.monotonic() + timeout
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status == "completed":
+            break
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise RuntimeError(f"Batch job {batch_id} ended with status '{batch.status}'.")
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Batch job {batch_id} did not finish within {timeout} seconds.")
+        time.sleep(poll_interval)
+
+    output = client.files.content(batch.output_file_id).text
+    return _parse_batch_output(output, len(prompts))
+
+def check_batch_analysis(batch_id: str):
+    """
+    Poll a batch job submitted with submit_batch_analysis.
+
+    Args:
+        batch_id: The id returned by submit_batch_analysis
+
+    Returns:
+        tuple: (status, result) where result is the response text once the
+        status is 'completed' and None while the job is still in progress
+        or has failed. A completed job whose request failed yields an
+        error string (the usual "Error: ..." convention), not None.
+    """
+    if not get_api_key("openai"):
+        raise RuntimeError("OpenAI API key not found.")
+    client = get_openai_client()
+
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != "completed":
+        return batch.status, None
+
+    # A batch can complete with no output file when every request in it
+    # failed - the failures land in error_file_id instead. Report that as
+    # a result rather than raising, so the caller can stop polling.
+    if not batch.output_file_id:
+        detail = ""
+        if batch.error_file_id:
+            try:
+                detail = client.files.content(batch.error_file_id).text.strip()
+            except Exception as e:
+                logger.warning(f"Could not read batch error file: {e}")
+        return batch.status, (
+            f"Error: Batch request failed: {detail}" if detail
+            else "Error: Batch completed without output."
+        )
+
+    # The output file holds one JSONL line per request; we submitted one
+    output = client.files.content(batch.output_file_id).text
+    return batch.status, _parse_batch_output(output, 1)[0]
+
+def _call_anthropic(request: LLMRequest) -> str:
     """
     Call the Anthropic API (Claude) with the given parameters.
     
@@ -251,11 +1224,7 @@ def _call_anthropic(
     function when a Claude model is requested.
     
     Args:
-        prompt: The text prompt to send to the model
-        model: Which Anthropic model to use (e.g., 'claude-3-opus')
-        temperature: Controls randomness (0.0 to 1.0)
-        max_tokens: Maximum response length
-        **kwargs: Additional parameters for the Anthropic API
+        request: The request to perform
         
     Returns:
         str: The model's response or an error message
@@ -271,21 +1240,28 @@ def _call_anthropic(
         # If no API key is found, create a helpful error message
         return "Error: Anthropic API key not found. Please add it to your .streamlit/secrets.toml file."
     
-    # Create an Anthropic client with our API key
-    client = anthropic.Anthropic(api_key=api_key)
+    # Reuse the shared client (and its warm connection pool)
+    client = get_anthropic_client()
     
     try:
-        # Make the API call to generate a message
+        # Make the API call to generate a message, retrying transient
+        # failures under the shared backoff policy
         # Anthropic uses a messages API similar to OpenAI's chat API
-        response = client.messages.create(
-            model=model,               # The specific Claude model to use
-            max_tokens=max_tokens,     # Maximum response length
-            temperature=temperature,   # Controls randomness
+        # The pinned anthropic SDK takes the system prompt as a plain
+        # string parameter (explicit cache_control blocks arrived in
+        # later SDK versions)
+        system_kwargs = {"system": request.system} if request.system else {}
+        response = _create_anthropic_message_retrying()(
+            client,
+            model=request.model,
+            max_tokens=request.max_tokens,
+            temperature=request.temperature,
+            **system_kwargs,
             messages=[
                 # User message contains our prompt
-                {"role": "user", "content": prompt}
+                {"role": "user", "content": request.prompt}
             ],
-            **kwargs                   # Any additional parameters
+            **request.extra_kwargs()   # Any additional provider options
         )
         # Extract the text content from the response
         # Anthropic returns content as a list of content blocks
@@ -293,4 +1269,31 @@ def _call_anthropic(
     except Exception as e:
         # Handle any errors that occur during the API call
         logger.error(f"Anthropic API error: {str(e)}")
-        return f"Anthropic API error: {str(e)}"
+        # "Error:" prefix matches the convention shared by every provider
+        # path - the caches only skip storing results with this prefix
+        return f"Error: Anthropic API error: {str(e)}"
+
+def _model_prefix(model: str) -> str:
+    """
+    Extract the provider prefix from a model name ("gpt-4o" -> "gpt").
+
+    Args:
+        model: The full model name
+
+    Returns:
+        str: The lowercased leading segment before the first hyphen
+    """
+    return model.split("-", 1)[0].lower()
+
+# Provider registries: one dict lookup replaces a chain of startswith
+# branches and stays O(1) as more providers are added - registering a new
+# provider is one entry per table, with no dispatch code to touch.
+_PROVIDER_DISPATCH = {
+    "gpt": _call_openai,
+    "claude": _call_anthropic,
+}
+
+_PROVIDER_DISPATCH_STREAM = {
+    "gpt": _call_openai_stream,
+    "claude": _call_anthropic_stream,
+}
@@ -0,0 +1,121 @@
+"""
+LLM Response Cache Module
+
+This module provides a persistent, disk-backed cache for LLM responses,
+keyed by a digest of the full request. A cache hit turns a multi-second
+billed network round-trip into a local lookup, which pays off both during
+development (re-running the same contract repeatedly) and in production
+when the same document is analyzed again.
+
+Only deterministic requests (temperature == 0) are cached: sampling at
+higher temperatures is expected to produce different answers each time,
+and serving a stored one would silently change that behavior.
+
+Author: R2Talk Team
+Created: 2025
+"""
+
+# Standard library imports
+import json                # For canonical serialization of the request fields
+import hashlib             # For digesting the request into a fixed-size key
+import logging             # For logging errors and information during execution
+
+# Create a logger specific to this module
+logger = logging.getLogger(__name__)  # __name__ will be 'utils.llm_cache'
+
+# Where cached responses live on disk, relative to the working directory
+CACHE_DIR = ".llm_cache"
+
+# How long a cached response stays valid (seconds)
+CACHE_TTL = 7 * 24 * 60 * 60
+
+# The diskcache.Cache instance, created on first use (None until then;
+# False if diskcache turned out to be unavailable)
+_cache = None
+
+# Hit/miss counters, reported through the logger so cache effectiveness
+# shows up in the application logs
+_hits = 0
+_misses = 0
+
+def _get_cache():
+    """
+    Open (once) the on-disk cache, or disable caching if diskcache is missing.
+
+    Returns:
+        The diskcache.Cache instance, or None when caching is unavailable
+    """
+    global _cache
+    if _cache is None:
+        try:
+            import diskcache
+            _cache = diskcache.Cache(CACHE_DIR)
+        except Exception as e:
+            # Without diskcache the app still works - every call just goes
+            # to the network as before
+            logger.warning(f"LLM response cache disabled: {e}")
+            _cache = False
+    return _cache or None
+
+def cache_key(model: str, prompt: str, temperature: float, max_tokens: int, system: str = "") -> str:
+    """
+    Compute the cache key for one request.
+
+    The fields are serialized to canonical JSON (sorted keys) before
+    hashing, so logically identical requests always map to the same key.
+
+    Args:
+        model: Which AI model the request targets
+        prompt: The full prompt text
+        temperature: Sampling temperature of the request
+        max_tokens: Maximum response length of the request
+        system: The system message, if any
+
+    Returns:
+        str: A SHA-256 hex digest identifying the request
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "prompt": prompt,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "system": system,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get(key: str):
+    """
+    Look up a cached response.
+
+    Args:
+        key: A digest from cache_key
+
+    Returns:
+        str: The cached response text, or None on a miss
+    """
+    global _hits, _misses
+    cache = _get_cache()
+    if cache is None:
+        return None
+    response = cache.get(key)
+    if response is not None:
+        _hits += 1
+        logger.info(f"LLM cache hit ({_hits} hits / {_misses} misses)")
+    else:
+        _misses += 1
+    return response
+
+def set(key: str, response: str) -> None:
+    """
+    Store a response under the given key.
+
+    Args:
+        key: A digest from cache_key
+        response: The response text to store
+    """
+    cache = _get_cache()
+    if cache is not None:
+        cache.set(key, response, expire=CACHE_TTL)
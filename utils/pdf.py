@@ -0,0 +1,291 @@
+"""
+PDF Text Extraction Module
+
+This module handles extracting text from PDF files for the contract analyzer.
+Extraction runs on pypdfium2 (a binding to the native PDFium engine, several
+times faster than pure-Python parsers for narrative text), with a pdfminer
+fallback for files where PDFium returns nothing. The fallback skips graphics
+operators entirely (contract PDFs with scanned letterheads or signature
+logos can carry megabytes of drawing commands for a few KB of text) and
+parallelizes extraction across pages for larger documents, since each page
+of a PDF can be parsed independently of the others.
+
+Author: R2Talk Team
+Created: 2025
+"""
+
+# Standard library imports
+import os                  # For querying the number of CPU cores
+import logging             # For logging errors and information during execution
+import multiprocessing     # Isolates extraction so a hung parse can be killed
+import queue               # For the Empty exception raised on queue.get timeout
+from io import BytesIO, StringIO  # Work with bytes/text data as file-like objects
+from concurrent.futures import ThreadPoolExecutor  # Runs page batches in parallel
+
+# Create a logger specific to this module
+logger = logging.getLogger(__name__)  # __name__ will be 'utils.pdf'
+
+# Documents with fewer pages than this are extracted sequentially - the cost
+# of spinning up worker threads isn't worth it for short contracts.
+_PARALLEL_THRESHOLD = 8
+
+# Upper bound on worker threads. pdfminer interpreter state is not
+# thread-safe, so each worker builds its own interpreter; more workers than
+# this mostly adds memory pressure without speeding things up.
+_MAX_WORKERS = 4
+
+# Wall-clock budget for extracting one document. Corrupt or adversarial
+# PDFs can send the parsers into pathological paths (e.g. decompressing a
+# broken stream byte by byte) that would otherwise occupy a worker forever.
+_EXTRACTION_TIMEOUT = 30
+
+# Cache for the lazily built interpreter class (pdfminer is a heavy import,
+# so we only define the subclass the first time the fallback actually runs)
+_TEXT_ONLY_INTERPRETER = None
+
+def _text_only_interpreter():
+    """
+    Build (once) a PDFPageInterpreter subclass that ignores graphics.
+
+    PDF content streams are often dominated by path-drawing and color
+    operators that contribute nothing to text extraction, yet pdfminer
+    still executes each one at Python speed. This subclass replaces the
+    path construction/painting and simple color operators with no-ops,
+    so only the text-showing machinery does real work.
+
+    The overridden methods keep the exact argument counts of the originals:
+    pdfminer pops operands off its argument stack based on the method
+    signature, so a wrong arity would corrupt the operand stream. The
+    variable-arity color operators (SC/SCN/sc/scn and the CS/cs state they
+    depend on) are deliberately left alone for the same reason.
+
+    Returns:
+        type: The interpreter subclass (cached after the first call)
+    """
+    global _TEXT_ONLY_INTERPRETER
+    if _TEXT_ONLY_INTERPRETER is not None:
+        return _TEXT_ONLY_INTERPRETER
+
+    from pdfminer.pdfinterp import PDFPageInterpreter
+
+    class TextOnlyInterpreter(PDFPageInterpreter):
+        # Path construction operators
+        def do_m(self, x, y): pass
+        def do_l(self, x, y): pass
+        def do_c(self, x1, y1, x2, y2, x3, y3): pass
+        def do_v(self, x2, y2, x3, y3): pass
+        def do_y(self, x1, y1, x3, y3): pass
+        def do_h(self): pass
+        def do_re(self, x, y, w, h): pass
+        # Path painting operators
+        def do_S(self): pass
+        def do_s(self): pass
+        def do_f(self): pass
+        def do_F(self): pass
+        def do_f_a(self): pass   # f*
+        def do_B(self): pass
+        def do_B_a(self): pass   # B*
+        def do_b(self): pass
+        def do_b_a(self): pass   # b*
+        def do_n(self): pass
+        # Clipping path operators
+        def do_W(self): pass
+        def do_W_a(self): pass   # W*
+        # Fixed-arity color operators
+        def do_G(self, gray): pass
+        def do_g(self, gray): pass
+        def do_RG(self, r, g, b): pass
+        def do_rg(self, r, g, b): pass
+        def do_K(self, c, m, y, k): pass
+        def do_k(self, c, m, y, k): pass
+        # Shading patterns
+        def do_sh(self, name): pass
+
+    _TEXT_ONLY_INTERPRETER = TextOnlyInterpreter
+    return _TEXT_ONLY_INTERPRETER
+
+def _extract_text_pdfium(pdf_bytes: bytes) -> str:
+    """
+    Extract text using pypdfium2 (Google's PDFium engine).
+
+    PDFium runs the content-stream parsing loop in native code, so for
+    narrative documents like contracts it is several times faster than
+    pure-Python pdfminer with comparable text quality.
+
+    Args:
+        pdf_bytes: The raw bytes of the PDF file
+
+    Returns:
+        str: The extracted text from all pages, with pages separated by
+             double newlines.
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(pdf_bytes)
+    try:
+        return "\n\n".join(
+            filter(None, (p.get_textpage().get_text_range() for p in pdf))
+        )
+    finally:
+        pdf.close()
+
+def _extract_page_range(pdf_bytes: bytes, pagenos) -> str:
+    """
+    Extract text from the given page numbers with the text-only interpreter.
+
+    Each worker builds its own resource manager, converter and interpreter
+    over the shared bytes, because pdfminer's interpreter state cannot be
+    used from multiple threads - the same independent-document-per-thread
+    approach used by other PDF libraries for parallel extraction.
+
+    Args:
+        pdf_bytes: The raw bytes of the PDF file
+        pagenos: Zero-based page numbers to extract
+
+    Returns:
+        str: The extracted text for those pages
+    """
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+
+    output = StringIO()
+    # caching=True keeps parsed shared resources (fonts, etc.) in the
+    # resource manager so pages reusing them don't re-parse per page
+    rsrcmgr = PDFResourceManager(caching=True)
+    device = TextConverter(
+        rsrcmgr,
+        output,
+        # Contracts are horizontal narrative text; skipping vertical-text
+        # detection and text inside figures avoids needless layout analysis,
+        # and the default line_margin groups contract lines sensibly
+        laparams=LAParams(detect_vertical=False, all_texts=False, line_margin=0.5),
+    )
+    interpreter = _text_only_interpreter()(rsrcmgr, device)
+    try:
+        for page in PDFPage.get_pages(BytesIO(pdf_bytes), pagenos=pagenos, caching=True):
+            interpreter.process_page(page)
+    finally:
+        device.close()
+    return output.getvalue()
+
+def _extract_text_miner(pdf_bytes: bytes) -> str:
+    """
+    Extract text using pdfminer with graphics operators skipped.
+
+    Short documents are parsed in a single pass. Longer ones are split into
+    contiguous page ranges handed to a thread pool, with each worker parsing
+    its range against its own interpreter.
+
+    Args:
+        pdf_bytes: The raw bytes of the PDF file
+
+    Returns:
+        str: The extracted text from all pages.
+    """
+    from pdfminer.pdfpage import PDFPage
+
+    # Count pages first so we know whether parallelism is worth it
+    # (enumerating pages only walks the page tree, it doesn't parse content)
+    num_pages = sum(1 for _ in PDFPage.get_pages(BytesIO(pdf_bytes)))
+    if num_pages < _PARALLEL_THRESHOLD:
+        return _extract_page_range(pdf_bytes, None)
+
+    # Split the pages into one contiguous range per worker
+    workers = min(_MAX_WORKERS, os.cpu_count() or 1)
+    chunk = -(-num_pages // workers)  # Ceiling division
+    ranges = [
+        list(range(i, min(i + chunk, num_pages)))
+        for i in range(0, num_pages, chunk)
+    ]
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        results = ex.map(lambda r: _extract_page_range(pdf_bytes, r), ranges)
+
+    # Concatenate the per-range text back in page order
+    return "".join(results)
+
+def extract_text(pdf_bytes: bytes) -> str:
+    """
+    Extract text from the given PDF bytes.
+
+    Tries pypdfium2 first for speed; if the native engine fails or finds no
+    text (some generators produce streams PDFium does not handle well),
+    falls back to the slower but more forgiving pdfminer path.
+
+    Args:
+        pdf_bytes: The raw bytes of the PDF file
+
+    Returns:
+        str: The extracted text from all pages.
+    """
+    try:
+        text = _extract_text_pdfium(pdf_bytes)
+        if text.strip():
+            return text
+        logger.info("pypdfium2 returned no text, falling back to pdfminer")
+    except Exception as e:
+        logger.warning(f"pypdfium2 extraction failed ({e}), falling back to pdfminer")
+
+    return _extract_text_miner(pdf_bytes)
+
+def _extraction_worker(pdf_bytes: bytes, result_queue) -> None:
+    """
+    Process target for extract_text_with_timeout.
+
+    Runs the normal extraction and ships either ("ok", text) or
+    ("error", message) back through the queue so the parent can tell a
+    parse failure from a timeout.
+    """
+    try:
+        result_queue.put(("ok", extract_text(pdf_bytes)))
+    except Exception as e:
+        result_queue.put(("error", str(e)))
+
+def extract_text_with_timeout(pdf_bytes: bytes, timeout: int = _EXTRACTION_TIMEOUT) -> str:
+    """
+    Extract text with a hard wall-clock limit.
+
+    Extraction runs in a separate process so a pathological file cannot
+    block the Streamlit worker forever - a thread could not be killed, but
+    a process can be terminated once the budget is spent.
+
+    Args:
+        pdf_bytes: The raw bytes of the PDF file
+        timeout: Maximum seconds to allow for extraction
+
+    Returns:
+        str: The extracted text.
+
+    Raises:
+        TimeoutError: If extraction exceeds the time budget
+        RuntimeError: If extraction fails inside the worker
+    """
+    result_queue = multiprocessing.Queue()
+    worker = multiprocessing.Process(
+        target=_extraction_worker, args=(pdf_bytes, result_queue)
+    )
+    worker.start()
+
+    # Drain the queue BEFORE joining: a child that has put more than the
+    # pipe buffer (~64 KB of text - routine for real contracts) cannot
+    # exit until the parent reads it, so join-first would block the full
+    # budget and then kill a worker that had already succeeded
+    try:
+        status, payload = result_queue.get(timeout=timeout)
+    except queue.Empty:
+        if worker.is_alive():
+            # Still parsing after the budget: kill it rather than letting
+            # it occupy the worker indefinitely
+            worker.terminate()
+            worker.join()
+            logger.error(f"PDF extraction timed out after {timeout}s")
+            raise TimeoutError(f"PDF extraction took longer than {timeout} seconds.")
+        # Dead without reporting (e.g. killed by the OS)
+        raise RuntimeError("PDF extraction worker exited unexpectedly.")
+
+    worker.join()
+    if status == "error":
+        raise RuntimeError(payload)
+    return payload
@@ -1,164 +1,436 @@
-from typing import Dict, Any, Optional
+import os
+import re
+import sys
+import mmap
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+from string import Formatter
+from typing import Dict, Any, List, Optional
 
-# Dictionary of prompt templates for different analysis types
-PROMPT_TEMPLATES = {
-    "Avaliação de Contrato de Compra e Venda de Imóveis": """
-    
-       Você é um renomado advogado especialista em direito imobiliário brasileiro, com profundo conhecimento da legislação vigente, da jurisprudência atual e das melhores práticas contratuais do mercado imobiliário nacional.
+# Directory holding one template file per analysis type. Keeping the
+# ~5 KB Portuguese real-estate template (and its siblings) out of the
+# Python source keeps the module's bytecode small, loads each template
+# only when its analysis type is actually requested, and lets the legal
+# text be edited without touching code.
+_PROMPTS_DIR = os.path.join(os.path.dirname(__file__), "prompts")
 
-       Sua missão é realizar uma análise detalhada, crítica e didática do contrato de compra e venda de imóvel apresentado a seguir. A análise deve resultar em um relatório estruturado, que contemple:
+# Maps each analysis type's display name to its template file
+_SLUG = {
+    "Avaliação de Contrato de Compra e Venda de Imóveis": "contrato_compra_venda",
+    "Contract Summary": "contract_summary",
+    "Risk Assessment": "risk_assessment",
+    "Legal Compliance Check": "legal_compliance_check",
+    "Custom Query": "custom_query",
+}
 
-       1. **Verificação da conformidade e completude do contrato**  
-       Avalie se o contrato contempla todas as cláusulas essenciais e recomendadas, incluindo:  
-       - Identificação completa e precisa das partes (nome, CPF, RG, estado civil, endereço e contatos)  
-       - Descrição detalhada e alinhada com a matrícula do imóvel (endereço, matrícula, área, confrontações, características físicas)  
-       - Valor total, forma de pagamento, prazos, condições para entrada, parcelas, juros, multas e correções monetárias  
-       - Prazos e condições para entrega da posse e das chaves  
-       - Cláusulas claras sobre rescisão, penalidades e consequências do inadimplemento  
-       - Garantias oferecidas pelo vendedor, incluindo inexistência de ônus, dívidas, ações judiciais e responsabilidades por vícios ou defeitos  
-       - Responsabilidades quanto a custos, impostos, taxas e despesas de transferência  
-       - Procedimentos para formalização, reconhecimento de firma e registro no Cartório de Registro de Imóveis  
-       - Due diligence prévia recomendada (verificação de certidões negativas, matrícula atualizada, existência de ônus e ações judiciais)  
-       - Cláusulas especiais aplicáveis, como pacto de melhor comprador, retrovenda, venda a contento e direito de preferência (preempção)  
-       - Definição do foro para eventuais disputas judiciais  
-       - Forma de assinatura (presencial, digital, testemunhas) e segurança jurídica associada  
-       - Transparência, clareza e ausência de ambiguidades, evitando brechas que possam gerar litígios futuros  
+# Fallback template used when an unknown analysis type is requested
+_DEFAULT_TEMPLATE = "Please analyze the following contract: {content}"
 
-       2. **Identificação e análise dos riscos**  
-       Explique os principais riscos jurídicos e financeiros para:  
-       - O comprador (ex.: riscos de ônus ocultos, falta de registro, cláusulas abusivas, prazos não cumpridos)  
-       - O vendedor (ex.: inadimplemento, rescisão unilateral, responsabilidade por vícios ocultos)  
+@lru_cache(maxsize=None)
+def get_template(analysis_type: str) -> str:
+    """
+    Load (once) the template text for an analysis type.
 
-       3. **Avaliação dos pontos fortes e pontos fracos**  
-       Liste e analise os pontos positivos e negativos do contrato para cada parte, destacando impactos práticos e jurídicos.
+    Args:
+        analysis_type: The analysis type's display name
 
-       4. **Recomendações e sugestões de melhorias**  
-       Proponha ajustes específicos para proteger os interesses de comprador e vendedor, aprimorar a segurança jurídica e mitigar riscos, incluindo sugestões para cláusulas adicionais ou correções textuais.
+    Returns:
+        str: The template text, or the generic fallback for unknown types
+    """
+    slug = _SLUG.get(analysis_type)
+    if slug is None:
+        return _DEFAULT_TEMPLATE
+    path = os.path.join(_PROMPTS_DIR, f"{slug}.md")
+    # Read through a memory map: the bytes come straight from the page
+    # cache with no intermediate read buffer, and when several worker
+    # processes serve the app those pages are shared between them rather
+    # than duplicated per process
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            text = mapped[:].decode("utf-8")
+    # The templates carry leading indentation inherited from their
+    # original triple-quoted literals; it means nothing to the model but
+    # was shipped (and billed as tokens) on every request. Normalizing
+    # once at load - the result is cached - trims roughly 10% of the
+    # template's bytes off every prompt.
+    return "\n".join(line.strip() for line in text.splitlines()).strip()
 
-       5. **Resumo executivo final**  
-       Apresente um resumo claro e objetivo das principais conclusões e recomendações para aprimoramento do contrato.
+@lru_cache(maxsize=None)
+def _parsed_template(analysis_type: str) -> tuple:
+    """
+    Parse (once) a template into alternating literal/field segments.
 
-    ---
+    str.format and string.Template both re-scan the whole template text
+    on every call. Parsing it a single time into (literal, field) pairs
+    reduces each render to a walk over the pairs and one str.join - no
+    per-call scanning of the ~5 KB real-estate prose at all.
 
-    ### Instruções adicionais:
+    Args:
+        analysis_type: The analysis type's display name
 
-    - Baseie sua análise na legislação imobiliária brasileira atualizada, na jurisprudência relevante e nas práticas contratuais consolidadas no mercado.  
-    - Utilize linguagem clara, técnica e didática, adequada tanto para profissionais do direito quanto para partes interessadas não especializadas.  
-    - Caso o texto fornecido não corresponda a um contrato válido de compra e venda de imóvel, informe explicitamente que o documento não atende aos requisitos legais e formais para tal contrato.  
+    Returns:
+        tuple: (literal, field) pairs in template order; field is None
+        for a trailing literal with no placeholder after it
+    """
+    # Literal segments are interned: every parse of the same template
+    # (and any template sharing boilerplate) points at one canonical
+    # string object instead of keeping duplicate copies alive
+    return tuple(
+        (sys.intern(literal) if literal else literal, field)
+        for literal, field, _spec, _conv in Formatter().parse(get_template(analysis_type))
+    )
 
-    ---
+@lru_cache(maxsize=None)
+def _compiled_renderer(analysis_type: str):
+    """
+    Generate (once, via exec) a render function specialized to a template.
 
-    ### Conteúdo para análise:
+    The generic render loop still pays a Python-level iteration and a
+    dict lookup per segment. Since every template uses only plain {name}
+    fields, a straight-line expression can be generated for each one -
+    no loop, no conditionals, just a single join compiled to bytecode. Literal segments are passed in through the exec namespace
+    rather than embedded in the generated source, so the multi-KB
+    Portuguese prose never needs escaping.
 
-    {content}
+    Args:
+        analysis_type: The analysis type's display name
 
-    ---
+    Returns:
+        The render function, taking the format_vars dict
+    """
+    pieces = _parsed_template(analysis_type)
+    literals = tuple(literal for literal, _field in pieces)
+    parts = []
+    for i, (literal, field) in enumerate(pieces):
+        if literal:
+            parts.append(f"_literals[{i}]")
+        if field is not None:
+            parts.append(f"str(_get({field!r}, ''))")
+    # A list display of known length is built by one BUILD_LIST opcode,
+    # and str.join over a list (not a generator) lets CPython size the
+    # result buffer in a first pass and copy in a second - one allocation
+    # for the whole prompt instead of one per concatenation
+    body = '"".join([' + ", ".join(parts) + "])" if parts else "''"
+    source = (
+        "def _render(format_vars, _literals=_literals):\n"
+        "    _get = format_vars.get\n"
+        f"    return {body}\n"
+    )
+    namespace = {"_literals": literals}
+    exec(source, namespace)
+    return namespace["_render"]
 
-    ### Estrutura do relatório esperado:
 
-    1. **Resumo do contrato**  
-       - Partes envolvidas  
-       - Objeto do contrato (descrição detalhada do imóvel)  
-       - Finalidade da compra e venda  
-       - Principais termos e condições  
-       - Datas importantes (assinatura, entrega, rescisão)  
-       - Obrigações financeiras (preço, forma de pagamento, multas, juros)  
+# The fields the shipped templates actually use; the fast path below is
+# specialized to exactly these, in this order
+_KNOWN_FIELDS = ("content", "custom_query", "instructions")
 
-    2. **Avaliação de riscos**  
-       - Riscos para o vendedor  
-       - Riscos para o comprador  
+@lru_cache(maxsize=None)
+def _fast_renderer(analysis_type: str):
+    """
+    Generate (once) a positional render function for the common case.
 
-    3. **Pontos fortes e pontos fracos**  
-       - Pontos fortes para o vendedor  
-       - Pontos fortes para o comprador  
-       - Pontos fracos para o vendedor  
-       - Pontos fracos para o comprador  
+    The dict-based renderer still allocates a format_vars dict per call.
+    Since every shipped template references only content, custom_query
+    and instructions, a renderer taking those three as plain positional
+    parameters needs no dict at all. Templates referencing any other
+    field fall back to the dict path (signalled by returning None).
 
-    4. **Sugestões de ajustes nas cláusulas**  
-       - Recomendações específicas para o vendedor  
-       - Recomendações específicas para o comprador  
+    Args:
+        analysis_type: The analysis type's display name
 
-    5. **Resumo e recomendações finais**
+    Returns:
+        The render function taking (content, custom_query, instructions),
+        or None when the template needs the generic path
+    """
+    pieces = _parsed_template(analysis_type)
+    if any(field is not None and field not in _KNOWN_FIELDS for _literal, field in pieces):
+        return None
+    literals = tuple(literal for literal, _field in pieces)
+    parts = []
+    for i, (literal, field) in enumerate(pieces):
+        if literal:
+            parts.append(f"_literals[{i}]")
+        if field is not None:
+            parts.append(field)
+    # Same single-allocation join as the generic renderer: exact-length
+    # list display plus str.join sizes the result once and copies once
+    body = '"".join([' + ", ".join(parts) + "])" if parts else "''"
+    source = (
+        "def _render(content, custom_query, instructions, _literals=_literals):\n"
+        f"    return {body}\n"
+    )
+    namespace = {"_literals": literals}
+    exec(source, namespace)
+    return namespace["_render"]
 
-    ---
 
-    Por favor, realize a análise detalhada conforme as instruções acima, assegurando a máxima profundidade, precisão e utilidade prática.
+# Fields every call site supplies (or that default safely to empty);
+# anything else a template references must be provided explicitly
+_DEFAULTED_FIELDS = frozenset({"content", "instructions"})
 
-    """,
-    
-    "Contract Summary": """
-    {instructions}
-    
-    Por favor, forneça um resumo abrangente do seguinte contrato:
-    
-    {content}
-    
-    Inclua informações-chave como:
-    1. Partes envolvidas
-    2. Contract purpose
-    3. Key terms and conditions
-    4. Important dates (effective date, termination, etc.)
-    5. Financial obligations
-    6. Notable clauses or provisions
-    """,
-    
-    "Risk Assessment": """
-    {instructions}
-    
-    Please analyze the following contract and identify potential risks:
-    
-    {content}
-    
-    Focus on:
-    1. Ambiguous language or clauses
-    2. Unfavorable terms
-    3. Missing protections
-    4. Liability concerns
-    5. Termination risks
-    6. Compliance issues
-    
-    For each risk identified, please provide:
-    - Description of the risk
-    - Potential impact
-    - Suggested mitigation strategy
-    """,
-    
-    "Legal Compliance Check": """
-    {instructions}
-    
-    Please review the following contract for legal compliance issues:
-    
-    {content}
-    
-    Consider:
-    1. Jurisdiction-specific requirements
-    2. Industry regulations
-    3. Standard legal protections
-    4. Required disclosures
-    5. Enforceability concerns
-    6. Recent legal developments that might affect this contract
-    
-    Provide a compliance assessment with specific references to sections that may need revision.
-    """,
-    
-    "Custom Query": """
-    {instructions}
-    
-    Please analyze the following contract with respect to this specific question:
-    
-    {custom_query}
-    
-    Contract:
-    {content}
-    
-    Provide a detailed answer with references to relevant sections of the contract.
+@lru_cache(maxsize=None)
+def _required_fields(analysis_type: str) -> frozenset:
     """
-}
+    The fields a template references that callers must supply.
+
+    Computed once per template from its parsed segments, so the per-call
+    cost of validation is a single frozenset difference (empty for every
+    template that only uses the defaulted fields).
+
+    Args:
+        analysis_type: The analysis type's display name
+
+    Returns:
+        frozenset: The required field names
+    """
+    referenced = frozenset(
+        field for _literal, field in _parsed_template(analysis_type) if field is not None
+    )
+    return referenced - _DEFAULTED_FIELDS
+
+
+class _RendererTable(dict):
+    """
+    Dispatch table mapping each analysis type straight to its renderer.
+
+    After the first call for a given analysis type, format_prompt's
+    dispatch is one C-level dict lookup - no lru_cache wrapper call, no
+    None check. Unknown and exotic templates are populated on first
+    access by __missing__, which wraps the generic dict-based renderer
+    when the positional fast renderer does not apply.
+    """
+
+    def __missing__(self, analysis_type):
+        renderer = _fast_renderer(analysis_type)
+        if renderer is None:
+            def renderer(content, custom_query, instructions, _analysis_type=analysis_type):
+                return _render_template(_analysis_type, {
+                    "content": content,
+                    "custom_query": custom_query,
+                    "instructions": instructions,
+                })
+        self[analysis_type] = renderer
+        return renderer
+
+_DISPATCH = _RendererTable()
+
+def _render_template(analysis_type: str, format_vars: Dict[str, Any]) -> str:
+    """
+    Assemble a prompt for an analysis type from field values.
+
+    Args:
+        analysis_type: The analysis type's display name
+        format_vars: Values for the template's fields; missing fields
+            render as empty strings
+
+    Returns:
+        str: The assembled prompt
+    """
+    return _compiled_renderer(analysis_type)(format_vars)
+
+def format_multi_prompt(
+    analysis_types: List[str],
+    content: str,
+    instructions: str = "",
+) -> tuple:
+    """
+    Build one request that covers several analysis types of the same contract.
+
+    Running N analysis types as N separate calls sends the contract text N
+    times over the wire (and bills its tokens N times). This packs the
+    contract once, followed by one numbered task block per analysis type,
+    and instructs the model to answer with a JSON object keyed by analysis
+    type - to be requested with response_format={"type": "json_object"}.
+
+    Args:
+        analysis_types: The analysis type names to run
+        content: The contract content to analyze (included once)
+        instructions: Additional user guidelines shared by all tasks
+
+    Returns:
+        tuple: (system_message, user_message) ready for a chat completion
+    """
+    system_message = (
+        "You are a helpful assistant that analyzes contracts. Perform each "
+        "numbered task below against the single contract provided. Respond "
+        "with a JSON object whose keys are exactly the task identifiers "
+        "shown in brackets and whose values are the complete text of the "
+        "corresponding analysis."
+    )
+
+    task_blocks = []
+    for i, analysis_type in enumerate(analysis_types, start=1):
+        # The contract is included once above the tasks, so each task's
+        # {content} slot becomes a reference instead of another full copy
+        task_text = _render_template(analysis_type, {
+            "content": "(use the CONTRACT provided above)",
+            "custom_query": "",
+            "instructions": instructions,
+        })
+        task_blocks.append(f"Task {i} [{analysis_type}]:\n{task_text}")
+
+    user_message = (
+        f"CONTRACT:\n{content}\n\n"
+        "TASKS (answer each one, JSON keys are the bracketed identifiers):\n\n"
+        + "\n\n".join(task_blocks)
+    )
+    return system_message, user_message
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    Count (or estimate) how many tokens the model will see for this text.
+
+    Uses tiktoken's exact tokenizer when available; falls back to the
+    usual ~4 characters per token rule of thumb if tiktoken is missing
+    or does not know the model.
+
+    Args:
+        text: The text to measure
+        model: The model whose tokenizer should be used
+
+    Returns:
+        int: The (estimated) token count
+    """
+    try:
+        import tiktoken
+        return len(tiktoken.encoding_for_model(model).encode(text))
+    except Exception:
+        # Rough but serviceable estimate: ~4 characters per token
+        return len(text) // 4
+
+def split_into_chunks(text: str, model: str = "gpt-4o", chunk_tokens: int = 4000) -> List[str]:
+    """
+    Split text into chunks of roughly chunk_tokens tokens each.
+
+    Splitting happens at paragraph boundaries (blank lines) so no clause
+    is cut mid-sentence; paragraphs are packed greedily until the next one
+    would push the chunk over the budget. A single paragraph larger than
+    the budget becomes its own chunk rather than being split.
+
+    Args:
+        text: The text to split
+        model: The model whose tokenizer sizes the chunks
+        chunk_tokens: Target maximum tokens per chunk
+
+    Returns:
+        List[str]: The chunks, in document order
+    """
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for paragraph in text.split("\n\n"):
+        paragraph_tokens = count_tokens(paragraph, model)
+        if current and current_tokens + paragraph_tokens > chunk_tokens:
+            chunks.append("\n\n".join(current))
+            current = []
+            current_tokens = 0
+        current.append(paragraph)
+        current_tokens += paragraph_tokens
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+# Clause headings used by Brazilian contracts ("CLÁUSULA PRIMEIRA - ...")
+# and English ones ("Section 3."). Splitting on these keeps each clause
+# intact inside a single chunk, which analyzes better than an arbitrary
+# paragraph cut through the middle of an obligation.
+_CLAUSE_HEADING = re.compile(r"\n(?=(?:CLÁUSULA|Cláusula|CLAUSULA|Section|SECTION)\b)")
+
+def chunk_content(content: str, model: str = "gpt-4o", max_tokens: int = 12000) -> List[str]:
+    """
+    Split a contract into chunks along clause boundaries.
+
+    A 100-page contract formatted straight into a prompt overflows the
+    model's context window and the request fails outright. This splits
+    the text where clauses begin (falling back to paragraph splitting for
+    sections that carry no headings or are themselves oversized) and
+    packs consecutive sections greedily up to the token budget, so each
+    chunk is a run of whole clauses.
+
+    Args:
+        content: The contract text to split
+        model: The model whose tokenizer sizes the chunks
+        max_tokens: Target maximum tokens per chunk
+
+    Returns:
+        List[str]: The chunks, in document order
+    """
+    if count_tokens(content, model) <= max_tokens:
+        return [content]
+
+    sections = _CLAUSE_HEADING.split(content)
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for section in sections:
+        section_tokens = count_tokens(section, model)
+        if section_tokens > max_tokens:
+            # A single giant clause (or a contract with no headings at
+            # all): flush what we have and split it by paragraphs instead
+            if current:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(split_into_chunks(section, model, max_tokens))
+            continue
+        if current and current_tokens + section_tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(section)
+        current_tokens += section_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def format_prompt_parts(
+    analysis_type: str,
+    content: str,
+    custom_query: Optional[str] = None,
+    **kwargs
+) -> tuple:
+    """
+    Format a prompt as separate (system, user) messages.
+
+    The instructional part of a template is identical for every contract
+    analyzed with the same analysis type - only the contract text itself
+    changes. Sending the instructions as the system message and the
+    contract alone as the user message puts the constant part first,
+    where OpenAI's automatic prompt-prefix cache (applied to prefixes of
+    1024+ tokens, which the real-estate template comfortably exceeds)
+    halves its token cost and latency on repeat analyses.
+
+    Args:
+        analysis_type: Type of analysis to perform
+        content: The contract content to analyze
+        custom_query: Custom question for the "Custom Query" analysis type
+        **kwargs: Additional variables to format into the prompt
+
+    Returns:
+        tuple: (system_message, user_message) for a chat completion
+    """
+    format_vars = {
+        # The contract goes in the user message; the template's {content}
+        # slot becomes a pointer so the system text stays constant
+        "content": "(analise o contrato fornecido na mensagem do usuário)",
+        "custom_query": custom_query or "",
+        **kwargs
+    }
+    system_message = _render_template(analysis_type, format_vars)
+    user_message = f"CONTRATO PARA ANÁLISE:\n\n{content}"
+    return system_message, user_message
 
 def format_prompt(
     analysis_type: str,
     content: str,
     custom_query: Optional[str] = None,
+    instructions: str = "",
+    max_content_chars: Optional[int] = None,
     **kwargs
 ) -> str:
     """
@@ -168,25 +440,139 @@ def format_prompt(
         analysis_type: Type of analysis to perform
         content: The contract content to analyze
         custom_query: Custom question for the "Custom Query" analysis type
+        instructions: Additional user guidelines for the analysis
+        max_content_chars: Optional hard cap on the content length;
+            longer content is rejected before any assembly work
         **kwargs: Additional variables to format into the prompt
         
     Returns:
         str: Formatted prompt ready to send to the LLM
+
+    Raises:
+        ValueError: If the template requires a field (e.g. custom_query
+            for "Custom Query") that the caller did not supply, or if
+            content exceeds max_content_chars
     """
-    # Get the appropriate template
-    template = PROMPT_TEMPLATES.get(
-        analysis_type,
-        "Please analyze the following contract: {content}"
-    )
-    
-    # Create formatting dictionary with all variables
+    # Fail fast when a required field is missing: formatting "Custom
+    # Query" without a custom_query used to silently substitute "" and
+    # send a broken prompt to the (billed) API. The required set is
+    # precomputed per template, so this is one set difference - and a
+    # plain falsy check for the templates that require nothing.
+    required = _required_fields(analysis_type)
+    if required:
+        provided = {"content", "instructions", *kwargs}
+        if custom_query is not None:
+            provided.add("custom_query")
+        missing = required - provided
+        if missing:
+            raise ValueError(
+                f"Missing required prompt field(s) for '{analysis_type}': "
+                + ", ".join(sorted(missing))
+            )
+
+    # Gate oversize content before doing any assembly work: len() is
+    # O(1), whereas rendering first and failing at the API wastes the
+    # whole multi-KB substitution. Rejecting (never silently truncating -
+    # dropped clauses would vanish from a legal analysis with no signal)
+    # follows the same fail-fast convention as the field validation
+    # below; callers that want to fit oversize contracts should split
+    # them with chunk_content instead.
+    if max_content_chars is not None and len(content) > max_content_chars:
+        raise ValueError(
+            f"Content is {len(content)} characters, over the "
+            f"{max_content_chars}-character limit; split it with "
+            "chunk_content instead."
+        )
+
+    # `is not None` instead of truthiness: PyObject_IsTrue on a long
+    # string is a needless length check, and we only care about None
+    custom_query = custom_query if custom_query is not None else ""
+
+    # Fast path for the common call shape: no extra fields, so no
+    # format_vars dict needs to be allocated - one table lookup plus one
+    # call into the specialized renderer
+    if not kwargs:
+        return _DISPATCH[analysis_type](content, custom_query, instructions)
+
+    # Generic path: create the formatting dictionary with all variables.
+    # Fields the caller didn't provide render as empty, so edited
+    # templates never break callers
     format_vars = {
         "content": content,
-        "custom_query": custom_query or "",
+        "custom_query": custom_query,
+        "instructions": instructions,
         **kwargs
     }
-    
-    # Format the template with the variables
-    return template.format(**format_vars)
+    return _render_template(analysis_type, format_vars)
 
+# Rendered-prompt cache: repeat renders of the same contract (Streamlit
+# reruns, retries, several backends sharing one prompt) become a dict
+# lookup instead of re-assembling a multi-KB string. Keys carry a digest
+# of the content rather than the content itself, so the cache stays
+# small; an OrderedDict gives least-recently-used eviction. (Strings
+# cannot be weak-referenced, so a WeakValueDictionary is not an option
+# here - the bounded LRU serves the same purpose.)
+_RENDER_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_RENDER_CACHE_MAX = 256
 
+def format_prompt_cached(
+    analysis_type: str,
+    content: str,
+    custom_query: Optional[str] = None,
+    **kwargs
+) -> str:
+    """
+    format_prompt with memoization of the rendered result.
+
+    format_prompt is pure, so identical inputs always produce identical
+    prompts; this front-end fingerprints the content with BLAKE2b and
+    serves repeat renders from a bounded LRU cache.
+
+    Args:
+        analysis_type: Type of analysis to perform
+        content: The contract content to analyze
+        custom_query: Custom question for the "Custom Query" analysis type
+        **kwargs: Additional variables to format into the prompt
+
+    Returns:
+        str: Formatted prompt ready to send to the LLM
+    """
+    content_key = hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+    key = (analysis_type, content_key, custom_query, tuple(sorted(kwargs.items())))
+    cached = _RENDER_CACHE.get(key)
+    if cached is not None:
+        _RENDER_CACHE.move_to_end(key)
+        return cached
+    result = format_prompt(analysis_type, content, custom_query, **kwargs)
+    _RENDER_CACHE[key] = result
+    if len(_RENDER_CACHE) > _RENDER_CACHE_MAX:
+        _RENDER_CACHE.popitem(last=False)
+    return result
+
+def format_prompt_bytes(
+    analysis_type: str,
+    content,
+    custom_query: Optional[str] = None,
+    **kwargs
+) -> bytes:
+    """
+    Format a prompt as UTF-8 bytes.
+
+    A thin wrapper over format_prompt: the SDKs this app ships take str
+    prompts and serialize them to JSON themselves, so there is no wire
+    path that benefits from hand-assembled bytes - and a separate bytes
+    renderer would quietly skip the required-field and size validation
+    format_prompt performs. Kept for callers that want the encoded form.
+
+    Args:
+        analysis_type: Type of analysis to perform
+        content: The contract content to analyze (str or UTF-8 bytes)
+        custom_query: Custom question for the "Custom Query" analysis type
+        **kwargs: Additional variables to format into the prompt
+
+    Returns:
+        bytes: The UTF-8 encoded prompt
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf-8")
+    return format_prompt(analysis_type, content, custom_query, **kwargs).encode("utf-8")
@@ -0,0 +1,251 @@
+"""
+Semantic LLM Response Cache Module
+
+The exact-match cache in utils/llm_cache.py only helps when the prompt is
+byte-for-byte identical. In practice users re-upload lightly edited
+contracts or rephrase a custom query, producing near-duplicate prompts
+that miss the exact cache but would get essentially the same answer.
+
+This module closes that gap: each prompt is embedded with a cheap
+embedding model (text-embedding-3-small) and compared against stored
+prompts by cosine similarity. If the nearest stored prompt is similar
+enough (above SIM_THRESHOLD), its response is served without a new
+completion call.
+
+The index is a plain numpy matrix of L2-normalized vectors searched with
+one dot product - at the scale of a single analyzer's cache (hundreds of
+entries) this is as fast as a dedicated vector index with none of the
+extra dependencies. Entries persist as JSON lines on disk so the cache
+survives restarts.
+
+Only deterministic requests (temperature == 0) should be routed here,
+for the same reason as the exact cache: sampled responses are expected
+to vary.
+
+Author: R2Talk Team
+Created: 2025
+"""
+
+# Standard library imports
+import os                  # For building the on-disk cache path
+import json                # For the JSON-lines persistence format
+import logging             # For logging errors and information during execution
+
+from typing import Optional, Tuple
+
+from utils.prompt import count_tokens  # For the embedding-input size gate
+
+# Create a logger specific to this module
+logger = logging.getLogger(__name__)  # __name__ will be 'utils.semantic_cache'
+
+# Cosine similarity above which a stored response is considered "the same
+# question". 0.92 is conservative: paraphrases and small edits pass,
+# genuinely different contracts do not.
+SIM_THRESHOLD = 0.92
+
+# Embedding model used to vectorize prompts; cheap and fast relative to
+# the completion call it can save
+EMBED_MODEL = "text-embedding-3-small"
+
+# The embedding model rejects inputs over 8192 tokens. Prompts past this
+# limit (a margin below the hard cap) skip the semantic cache entirely
+# rather than paying an embeddings round-trip that is guaranteed to fail -
+# oversized contracts are served by the chunking path anyway.
+_EMBED_MAX_TOKENS = 8000
+
+# Where entries persist, alongside the exact-match cache
+CACHE_FILE = os.path.join(".llm_cache", "semantic.jsonl")
+
+# Cap on stored entries so the linear search and the file stay small
+MAX_ENTRIES = 512
+
+# In-memory state, loaded lazily from CACHE_FILE on first use:
+# _vectors is an (n, dim) numpy matrix of normalized embeddings,
+# _responses the matching list of response texts and _params the matching
+# list of (model, max_tokens, system) tuples each response was produced
+# under. _vectors is None until loaded; False if numpy turned out to be
+# unavailable.
+_vectors = None
+_responses = None
+_params = None
+
+def _load():
+    """
+    Load (once) the persisted entries into memory.
+
+    Entries written before request parameters were recorded load with
+    params of None, which never matches a live request - so an old cache
+    file is effectively invalidated rather than serving answers produced
+    under unknown settings.
+
+    Returns:
+        bool: True when the cache is usable, False when disabled
+    """
+    global _vectors, _responses, _params
+    if _vectors is False:
+        return False
+    if _vectors is not None:
+        return True
+    try:
+        import numpy as np
+    except Exception as e:
+        logger.warning(f"Semantic cache disabled: {e}")
+        _vectors = False
+        return False
+
+    vectors = []
+    responses = []
+    params = []
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                vectors.append(entry["embedding"])
+                responses.append(entry["response"])
+                stored = entry.get("params")
+                params.append(tuple(stored) if stored is not None else None)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # A corrupt cache file should never break the app; start fresh
+        logger.warning(f"Semantic cache reset after load error: {e}")
+        vectors, responses, params = [], [], []
+
+    _vectors = np.array(vectors, dtype="float32") if vectors else np.empty((0, 0), dtype="float32")
+    _responses = responses
+    _params = params
+    return True
+
+def _reset():
+    """
+    Drop all entries, in memory and on disk.
+
+    Used when the persisted vectors turn out to be unusable (e.g. written
+    with a different embedding model, so their dimension no longer matches
+    fresh embeddings).
+    """
+    global _vectors, _responses, _params
+    import numpy as np
+    _vectors = np.empty((0, 0), dtype="float32")
+    _responses = []
+    _params = []
+    try:
+        os.remove(CACHE_FILE)
+    except OSError:
+        pass
+
+def _embed(prompt: str):
+    """
+    Embed a prompt into a normalized vector, or None if embedding fails.
+
+    Args:
+        prompt: The prompt text to embed
+
+    Returns:
+        The L2-normalized embedding as a numpy array, or None
+    """
+    try:
+        import numpy as np
+        # Imported here to avoid a circular import with utils.llm, which
+        # imports this module
+        from utils.llm import get_openai_client
+        result = get_openai_client().embeddings.create(
+            model=EMBED_MODEL,
+            input=prompt,
+        )
+        vector = np.array(result.data[0].embedding, dtype="float32")
+        return vector / np.linalg.norm(vector)
+    except Exception as e:
+        logger.warning(f"Semantic cache embedding failed: {e}")
+        return None
+
+def lookup(
+    prompt: str, model: str, max_tokens: int, system: str = ""
+) -> Tuple[Optional[str], Optional[object]]:
+    """
+    Look for a stored response to a semantically similar prompt.
+
+    Similarity alone is not enough for a hit: a response produced by a
+    different model, with a different output budget or under a different
+    system message is not "the same answer", so only entries stored under
+    the same (model, max_tokens, system) are considered.
+
+    The embedding computed for the lookup is returned as well, so that a
+    miss followed by a fresh LLM call can store() the new response
+    without embedding the prompt a second time.
+
+    Args:
+        prompt: The prompt about to be sent to the LLM
+        model: The model the request targets
+        max_tokens: The requested output budget
+        system: The system message, if any
+
+    Returns:
+        tuple: (response, embedding) - response is None on a miss, and
+        embedding is None when the cache is unavailable
+    """
+    if not _load():
+        return None, None
+    # Prompts past the embedding model's input cap cannot be embedded;
+    # skip the doomed round-trip instead of paying it on every call
+    if count_tokens(prompt, EMBED_MODEL) > _EMBED_MAX_TOKENS:
+        return None, None
+    embedding = _embed(prompt)
+    if embedding is None:
+        return None, None
+    if len(_responses) == 0:
+        return None, embedding
+    if _vectors.shape[1] != embedding.shape[0]:
+        # Persisted vectors have a different dimension than fresh ones
+        # (embedding model changed); they can never match, so start over
+        logger.warning(
+            f"Semantic cache reset: stored embeddings have dimension "
+            f"{_vectors.shape[1]}, current model produces {embedding.shape[0]}"
+        )
+        _reset()
+        return None, embedding
+    request_params = (model, max_tokens, system)
+    candidates = [i for i, p in enumerate(_params) if p == request_params]
+    if not candidates:
+        return None, embedding
+    # Vectors are normalized, so the dot product is the cosine similarity
+    similarities = _vectors[candidates] @ embedding
+    best = int(similarities.argmax())
+    if similarities[best] >= SIM_THRESHOLD:
+        logger.info(f"Semantic cache hit (similarity {similarities[best]:.3f})")
+        return _responses[candidates[best]], embedding
+    return None, embedding
+
+def store(embedding, response: str, model: str, max_tokens: int, system: str = "") -> None:
+    """
+    Store a fresh response under its prompt embedding.
+
+    Args:
+        embedding: The normalized embedding returned by lookup()
+        response: The response text to store
+        model: The model that produced the response
+        max_tokens: The output budget the response was requested with
+        system: The system message the response was produced under
+    """
+    global _vectors, _responses
+    if embedding is None or not _load():
+        return
+    if len(_responses) >= MAX_ENTRIES:
+        # Simple cap: stop adding rather than evicting, the TTL-free file
+        # can always be deleted to start over
+        return
+    try:
+        import numpy as np
+        row = embedding.reshape(1, -1)
+        _vectors = row if len(_responses) == 0 else np.vstack([_vectors, row])
+        _responses.append(response)
+        _params.append((model, max_tokens, system))
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        with open(CACHE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "embedding": embedding.tolist(),
+                "response": response,
+                "params": [model, max_tokens, system],
+            }) + "\n")
+    except Exception as e:
+        logger.warning(f"Semantic cache store failed: {e}")